@@ -0,0 +1,61 @@
+#!/usr/bin/env python
+"""
+Compares CSV output throughput of ``csv.DictWriter`` against
+``utils.write_csv``, and of the TSV and Postgres COPY writers, writing to
+/dev/null.
+
+    python benchmarks/csv_output.py tests/data/20160301_super_tuesday.json
+"""
+import argparse
+import csv
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'elex_micro'))
+
+import pgcopy  # noqa
+import utils  # noqa
+
+DEFAULT_FILE = 'tests/data/20160301_super_tuesday.json'
+
+
+def dictwriter(payload, writefile):
+    writer = csv.DictWriter(writefile, fieldnames=utils.KEY_ORDER)
+    writer.writeheader()
+    for p in payload:
+        writer.writerow(p)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark CSV output')
+    parser.add_argument('file', nargs='?', default=DEFAULT_FILE)
+    parser.add_argument('-r', '--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    electiondate, races = utils.open_file(args.file)
+    payload = utils.load_results(electiondate, races)
+
+    print('%s: %d rows' % (args.file, len(payload)))
+    print('%-16s %10s %14s' % ('writer', 'ms', 'rows/sec'))
+
+    writers = (
+        ('DictWriter', dictwriter, 'w'),
+        ('write_csv', utils.write_csv, 'w'),
+        ('write_tsv', utils.write_tsv, 'w'),
+        ('pgcopy text', pgcopy.write_text, 'w'),
+        ('pgcopy binary', pgcopy.write_binary, 'wb'),
+    )
+
+    for name, func, mode in writers:
+        with open(os.devnull, mode) as writefile:
+            elapsed = float('inf')
+            for i in range(args.repeat):
+                start = time.time()
+                func(payload, writefile)
+                elapsed = min(elapsed, time.time() - start)
+        print('%-16s %10.2f %14d' % (name, elapsed * 1000, len(payload) / elapsed))
+
+
+if __name__ == '__main__':
+    main()
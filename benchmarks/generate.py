@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+"""
+Deterministic AP-shaped payloads for benchmarks.
+
+``generate`` builds an AP results file with a given number of races,
+reporting units per race and candidates per race. A share of the races
+are in New England states, where every reporting unit is a township that
+gets rolled up into a county. Values come from a seeded generator that
+gives the same file on Python 2 and 3, so runs on different versions of
+the code parse identical input.
+
+    python benchmarks/generate.py -r 500 -u 100 -c 6 -n 0.1 > /tmp/payload.json
+"""
+import argparse
+import collections
+import itertools
+import json
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'elex_micro'))
+
+import maps  # noqa
+
+ELECTION_DATE = '2016-11-08'
+
+# States outside New England and their fips codes.
+STATES = (
+    ('AZ', '04'),
+    ('FL', '12'),
+    ('GA', '13'),
+    ('MI', '26'),
+    ('NC', '37'),
+    ('OH', '39'),
+    ('PA', '42'),
+    ('TX', '48'),
+    ('VA', '51'),
+    ('WI', '55'),
+)
+
+NEW_ENGLAND_STATES = sorted(maps.NEW_ENGLAND_STATES)
+
+OFFICES = (
+    ('P', 'President'),
+    ('S', 'U.S. Senate'),
+    ('H', 'U.S. House'),
+    ('G', 'Governor'),
+)
+
+PARTIES = ('Dem', 'GOP', 'Lib', 'Grn', 'Ind')
+
+
+class PayloadGenerator(object):
+    """
+    Builds AP races from a seeded random number generator. Only
+    ``random()`` is used, since the integer helpers of ``random.Random``
+    give different sequences on Python 2 and 3.
+    """
+
+    def __init__(self, seed=0):
+        self.rng = random.Random(seed)
+        self.new_england_races = 0
+
+    def randint(self, n):
+        return int(self.rng.random() * n)
+
+    def candidates(self, race_index, count):
+        candidates = []
+        for i in range(count):
+            number = race_index * count + i
+            candidates.append(collections.OrderedDict([
+                ('first', 'First%d' % number),
+                ('last', 'Last%d' % number),
+                ('party', PARTIES[i % len(PARTIES)]),
+                ('candidateID', str(10000 + number)),
+                ('polID', str(20000 + number)),
+                ('ballotOrder', i + 1),
+                ('polNum', str(30000 + number)),
+            ]))
+        return candidates
+
+    def reporting_unit(self, fields, candidates, votes, precincts_total, precincts_reporting):
+        ru = collections.OrderedDict(fields)
+        ru['precinctsReporting'] = precincts_reporting
+        ru['precinctsTotal'] = precincts_total
+        ru['precinctsReportingPct'] = round(100.0 * precincts_reporting / precincts_total, 2)
+        ru['candidates'] = []
+        for c, v in zip(candidates, votes):
+            c = collections.OrderedDict(c)
+            c['voteCount'] = v
+            ru['candidates'].append(c)
+        return ru
+
+    def race(self, race_index, reporting_units, candidate_count, new_england):
+        if new_england:
+            state = NEW_ENGLAND_STATES[self.new_england_races % len(NEW_ENGLAND_STATES)]
+            self.new_england_races += 1
+            counties = sorted(maps.FIPS_TO_STATE[state])
+        else:
+            state, state_fips = STATES[race_index % len(STATES)]
+            counties = ['%s%03d' % (state_fips, 2 * i + 1) for i in range(max(reporting_units - 1, 1))]
+
+        office_id, office_name = OFFICES[race_index % len(OFFICES)]
+        candidates = self.candidates(race_index, candidate_count)
+
+        subunits = []
+        totals = [0] * candidate_count
+        precincts_total = 0
+        precincts_reporting = 0
+
+        for i in range(reporting_units - 1):
+            votes = [self.randint(5000) for c in candidates]
+            total = 1 + self.randint(20)
+            reporting = self.randint(total + 1)
+            fields = [
+                ('statePostal', state),
+                ('reportingunitName', '%s Unit %d' % (state, i + 1)),
+                ('reportingunitID', str(1000 + i)),
+                ('level', 'subunit'),
+                ('fipsCode', counties[i % len(counties)]),
+                ('lastUpdated', '2016-11-09T03:00:00Z'),
+            ]
+            subunits.append(self.reporting_unit(fields, candidates, votes, total, reporting))
+
+            totals = [t + v for t, v in zip(totals, votes)]
+            precincts_total += total
+            precincts_reporting += reporting
+
+        fields = [
+            ('statePostal', state),
+            ('stateName', maps.STATE_ABBR[state]),
+            ('level', 'state'),
+            ('lastUpdated', '2016-11-09T03:00:00Z'),
+        ]
+        state_ru = self.reporting_unit(fields, candidates, totals, precincts_total or 1, precincts_reporting)
+        # A third of the races have been called.
+        if candidates and race_index % 3 == 0:
+            leader = totals.index(max(totals))
+            state_ru['candidates'][leader]['winner'] = 'X'
+
+        return collections.OrderedDict([
+            ('test', True),
+            ('raceID', str(10000 + race_index)),
+            ('raceType', 'General'),
+            ('raceTypeID', 'G'),
+            ('officeID', office_id),
+            ('officeName', office_name),
+            ('national', True),
+            ('reportingUnits', [state_ru] + subunits),
+        ])
+
+
+def iter_races(reporting_units=50, candidates=4, new_england=0.1, seed=0):
+    """
+    Yields races without end. ``new_england`` is the share of races in New
+    England states; they are spread evenly through the sequence.
+    """
+    generator = PayloadGenerator(seed)
+    for i in itertools.count():
+        is_new_england = int((i + 1) * new_england) > int(i * new_england)
+        yield generator.race(i, reporting_units, candidates, is_new_england)
+
+
+def generate(races=100, reporting_units=50, candidates=4, new_england=0.1, seed=0):
+    """
+    Returns an AP results payload of the first ``races`` races of
+    ``iter_races``.
+    """
+    return collections.OrderedDict([
+        ('electionDate', ELECTION_DATE),
+        ('timestamp', '2016-11-09T03:00:00.000Z'),
+        ('nextrequest', 'http://api.ap.org/v2/elections/%s?format=JSON&level=RU' % ELECTION_DATE),
+        ('races', list(itertools.islice(iter_races(reporting_units, candidates, new_england, seed), races))),
+    ])
+
+
+def write(payload, writefile):
+    """
+    Writes a payload as compact JSON, keeping AP's key order.
+    """
+    writefile.write(json.dumps(payload, separators=(',', ':')))
+
+
+def add_arguments(parser):
+    parser.add_argument('-r', '--races', type=int, default=100)
+    parser.add_argument('-u', '--reporting-units', type=int, default=50, help='Reporting units per race')
+    parser.add_argument('-c', '--candidates', type=int, default=4, help='Candidates per race')
+    parser.add_argument('-n', '--new-england', type=float, default=0.1,
+                        help='Share of races in New England states')
+    parser.add_argument('--seed', type=int, default=0)
+
+
+def generate_from_args(args):
+    return generate(args.races, args.reporting_units, args.candidates, args.new_england, args.seed)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic AP results file')
+    add_arguments(parser)
+    args = parser.parse_args()
+    write(generate_from_args(args), sys.stdout)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+"""
+Times each stage of the results pipeline on one input and records the
+timings as JSON, so runs on different versions of the code can be
+compared.
+
+The input is an AP file, or a payload from ``generate.py`` built from the
+same shape arguments. ``open_file``, ``set_new_england_counties`` and
+``load_results`` are timed on their own, and so is every output writer on
+the loaded results. Each stage reports its best time over ``--repeat``
+runs.
+
+    python benchmarks/harness.py -r 500 -u 100 -o before.json
+    python benchmarks/harness.py -r 500 -u 100 --compare before.json
+"""
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'elex_micro'))
+
+import arrowfile  # noqa
+import generate  # noqa
+import pgcopy  # noqa
+import sqlitestore  # noqa
+import utils  # noqa
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+
+def best_time(func, setup, repeat):
+    """
+    Returns the best time of ``func(setup())`` over ``repeat`` runs. The
+    setup is not timed.
+    """
+    elapsed = float('inf')
+    for i in range(repeat):
+        arg = setup()
+        start = time.time()
+        func(arg)
+        elapsed = min(elapsed, time.time() - start)
+    return elapsed
+
+
+def new_england_counties(races):
+    for r in races:
+        if r.get('reportingUnits', None):
+            utils.set_new_england_counties(r)
+
+
+def writer(write, mode):
+    def run(payload, path):
+        with open(path, mode) as writefile:
+            write(payload, writefile)
+    return run
+
+
+def sqlite_writer(payload, path):
+    if os.path.exists(path):
+        os.remove(path)
+    sqlitestore.write_sqlite(payload, path)
+
+
+def writers():
+    stages = [
+        ('write_csv', writer(utils.write_csv, 'w')),
+        ('write_tsv', writer(utils.write_tsv, 'w')),
+        ('write_json', writer(utils.write_json, 'w')),
+        ('write_jsonl', writer(utils.write_jsonl, 'w')),
+        ('pgcopy_text', writer(pgcopy.write_text, 'w')),
+        ('pgcopy_binary', writer(pgcopy.write_binary, 'wb')),
+        ('sqlite', sqlite_writer),
+    ]
+    if arrowfile.pyarrow is not None:
+        stages.append(('parquet', writer(arrowfile.write_parquet, 'wb')))
+        stages.append(('arrow', writer(arrowfile.write_arrow, 'wb')))
+    return stages
+
+
+def version():
+    """
+    Returns the git commit of the code being timed, if it is available.
+    """
+    try:
+        with open(os.devnull, 'w') as devnull:
+            output = subprocess.check_output(['git', 'describe', '--always', '--dirty'], cwd=ROOT,
+                                             stderr=devnull)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return output.decode('utf-8').strip()
+
+
+def run(file_path, repeat, directory):
+    """
+    Times every stage on ``file_path``, yielding each stage's name and
+    its seconds and rows per second as it finishes.
+    """
+    def races():
+        return utils.open_file(file_path)[1]
+
+    electiondate, raw_races = utils.open_file(file_path)
+    payload = utils.load_results(electiondate, raw_races)
+    rows = len(payload)
+
+    stages = [
+        ('open_file', lambda arg: utils.open_file(file_path), lambda: None),
+        ('set_new_england_counties', new_england_counties, races),
+        ('load_results', lambda arg: utils.load_results(electiondate, arg), races),
+    ]
+    output_path = os.path.join(directory, 'output')
+    for name, func in writers():
+        stages.append((name, lambda arg, func=func: func(payload, output_path), lambda: None))
+
+    for name, func, setup in stages:
+        elapsed = best_time(func, setup, repeat)
+        yield name, {'seconds': elapsed, 'rows_per_sec': rows / elapsed if elapsed else None}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark the results pipeline')
+    parser.add_argument('file', nargs='?', help='AP file to time; generated if not given')
+    generate.add_arguments(parser)
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('-o', '--output', help='Write the timings as JSON to this path')
+    parser.add_argument('--compare', help='Timings JSON of an earlier run to compare against')
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help='Exit with an error if a stage is this many times slower than --compare')
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    try:
+        file_path = args.file
+        shape = None
+        if file_path is None:
+            shape = {
+                'races': args.races,
+                'reporting_units': args.reporting_units,
+                'candidates': args.candidates,
+                'new_england': args.new_england,
+                'seed': args.seed,
+            }
+            file_path = os.path.join(directory, 'payload.json')
+            with open(file_path, 'w') as writefile:
+                generate.write(generate.generate_from_args(args), writefile)
+
+        electiondate, races = utils.open_file(file_path)
+        record = {
+            'version': version(),
+            'python': platform.python_version(),
+            'implementation': platform.python_implementation(),
+            'platform': platform.platform(),
+            'date': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'input': {
+                'file': args.file,
+                'generated': shape,
+                'bytes': os.path.getsize(file_path),
+                'races': len(races),
+                'rows': len(utils.load_results(electiondate, races)),
+            },
+            'repeat': args.repeat,
+            'stages': {},
+        }
+
+        previous = None
+        if args.compare:
+            with open(args.compare, 'r') as readfile:
+                previous = json.load(readfile)['stages']
+
+        print('%s: %d races, %d rows, %.1f MB' % (
+            args.file or 'generated', record['input']['races'], record['input']['rows'],
+            record['input']['bytes'] / 1024.0 / 1024.0))
+        print('%-26s %10s %14s %8s' % ('stage', 'ms', 'rows/sec', 'ratio'))
+
+        slower = []
+        for name, timing in run(file_path, args.repeat, directory):
+            record['stages'][name] = timing
+            ratio = ''
+            if previous and name in previous:
+                ratio = timing['seconds'] / previous[name]['seconds']
+                if ratio > args.threshold:
+                    slower.append(name)
+                ratio = '%7.2fx' % ratio
+            print('%-26s %10.2f %14d %8s' % (name, timing['seconds'] * 1000, timing['rows_per_sec'] or 0, ratio))
+
+    finally:
+        shutil.rmtree(directory)
+
+    if args.output:
+        with open(args.output, 'w') as writefile:
+            json.dump(record, writefile, indent=2, sort_keys=True)
+
+    if slower:
+        sys.exit('Slower than %s: %s' % (args.compare, ', '.join(slower)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,125 @@
+#!/usr/bin/env python
+"""
+Compares the ways of reading a large AP file: ``ujson.loads`` of the whole
+file read into memory, ``jsonstream.load_mapped``, and streaming races
+from chunked reads and from a memory map. Each method runs in its own
+process so its peak RSS can be reported.
+
+With no file, a synthetic file of ``--size`` MB is written from the races
+of ``generate.iter_races``.
+
+    python benchmarks/mmap_input.py --size 500
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'elex_micro'))
+
+import jsonstream  # noqa
+import ujson  # noqa
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import generate  # noqa
+
+
+def write_sized(path, size):
+    """
+    Writes a synthetic AP file of at least ``size`` bytes to ``path``, a
+    race at a time, so the payload is never held in memory.
+    """
+    with open(path, 'w') as writefile:
+        writefile.write('{"electionDate":"%s","races":[' % generate.ELECTION_DATE)
+        written = 0
+        for race in generate.iter_races(reporting_units=100, candidates=6):
+            if written:
+                writefile.write(',')
+            data = json.dumps(race, separators=(',', ':'))
+            writefile.write(data)
+            written += len(data) + 1
+            if written >= size:
+                break
+        writefile.write(']}')
+
+
+def read_loads(path):
+    with open(path, 'r') as readfile:
+        return len(ujson.loads(readfile.read())['races'])
+
+
+def read_mapped(path):
+    return len(jsonstream.load_mapped(path)['races'])
+
+
+def stream_chunks(path):
+    return sum(1 for r in jsonstream.open_races(path))
+
+
+def stream_mapped(path):
+    return sum(1 for r in jsonstream.open_races(path, use_mmap=True))
+
+
+METHODS = [
+    ('ujson.loads(read())', read_loads),
+    ('load_mapped', read_mapped),
+    ('stream (chunks)', stream_chunks),
+    ('stream (mmap)', stream_mapped),
+]
+
+
+def measure(method, path):
+    """
+    Runs one method and prints its races, seconds and peak RSS in MB.
+    """
+    func = dict(METHODS)[method]
+    start = time.time()
+    races = func(path)
+    elapsed = time.time() - start
+
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        maxrss /= 1024
+    print('%d %f %f' % (races, elapsed, maxrss / 1024.0))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark reading large AP files')
+    parser.add_argument('file', nargs='?')
+    parser.add_argument('-s', '--size', type=int, default=500, help='Size in MB of the generated file')
+    parser.add_argument('--measure', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.measure:
+        measure(args.measure, args.file)
+        return
+
+    path = args.file
+    if path is None:
+        handle, path = tempfile.mkstemp(suffix='.json')
+        os.close(handle)
+        write_sized(path, args.size * 1024 * 1024)
+
+    try:
+        print('%s (%.1f MB), orjson: %s' % (
+            path, os.path.getsize(path) / 1024.0 / 1024.0, jsonstream.orjson is not None))
+        print('%-22s %8s %10s %12s' % ('method', 'races', 'seconds', 'peak RSS MB'))
+        for name, func in METHODS:
+            output = subprocess.check_output(
+                [sys.executable, os.path.abspath(__file__), path, '--measure', name]
+            )
+            races, elapsed, maxrss = output.split()
+            print('%-22s %8s %10.2f %12.1f' % (name, races.decode(), float(elapsed), float(maxrss)))
+    finally:
+        if args.file is None:
+            os.remove(path)
+
+
+if __name__ == '__main__':
+    main()
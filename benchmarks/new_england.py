@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+"""
+Regression benchmark for the New England county rollups. Times
+``set_new_england_counties`` across every race in the CT, RI and Super
+Tuesday fixtures.
+
+    python benchmarks/new_england.py -r 10
+"""
+import argparse
+import copy
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'elex_micro'))
+
+import utils  # noqa
+
+FIXTURES = (
+    'tests/data/20160426_ct_rollups.json',
+    'tests/data/20160426-ri_mail_ballots.json',
+    'tests/data/20160301_super_tuesday.json',
+)
+
+
+def run(races):
+    start = time.time()
+    for r in races:
+        if r.get('reportingUnits', None):
+            utils.set_new_england_counties(r)
+    return time.time() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark New England county rollups')
+    parser.add_argument('files', nargs='*', default=FIXTURES)
+    parser.add_argument('-r', '--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    print('%-45s %8s %10s' % ('file', 'races', 'ms'))
+
+    for file_path in args.files:
+        electiondate, races = utils.open_file(file_path)
+
+        # The rollup appends to the race in place, so each run gets a copy.
+        elapsed = min(run(copy.deepcopy(races)) for i in range(args.repeat))
+        print('%-45s %8d %10.2f' % (file_path, len(races), elapsed * 1000))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+#!/usr/bin/env python
+"""
+Compares the ways of computing ``totalvotes`` and ``votepct``: the per-row
+``aggregate_votecounts``/``compute_pcts`` loops, and the pure-Python and
+NumPy paths of ``kernels.group_pcts``.
+
+    python benchmarks/pcts.py tests/data/20160301_super_tuesday.json
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'elex_micro'))
+
+import kernels  # noqa
+import utils  # noqa
+
+DEFAULT_FILE = 'tests/data/20160301_super_tuesday.json'
+
+
+def per_row(races):
+    for raceid, payload in races:
+        votecounts = {raceid: {}}
+        for c in payload:
+            votecounts = utils.aggregate_votecounts(votecounts, c, {'raceID': raceid})
+        utils.compute_pcts(payload, votecounts)
+
+
+def kernel_python(races):
+    for raceid, payload in races:
+        kernels.group_pcts_python(
+            [c['votecount'] for c in payload],
+            [c['reportingunitid'] for c in payload]
+        )
+
+
+def kernel_numpy(races):
+    for raceid, payload in races:
+        totals, pcts = kernels.group_pcts_numpy(
+            [c['votecount'] for c in payload],
+            kernels.group_codes([c['reportingunitid'] for c in payload])
+        )
+        totals.tolist()
+        pcts.tolist()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark vote total kernels')
+    parser.add_argument('file', nargs='?', default=DEFAULT_FILE)
+    parser.add_argument('-r', '--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    electiondate, races = utils.open_file(args.file)
+    races = [
+        (r['raceID'], list(utils.build_race(electiondate, r)))
+        for r in races if r.get('reportingUnits', None)
+    ]
+    rows = sum(len(payload) for raceid, payload in races)
+
+    paths = [('per-row loops', per_row), ('kernel (python)', kernel_python)]
+    if kernels.numpy is not None:
+        paths.append(('kernel (numpy)', kernel_numpy))
+
+    print('%s: %d races, %d rows' % (args.file, len(races), rows))
+    print('%-16s %10s %14s' % ('path', 'ms', 'rows/sec'))
+
+    for name, func in paths:
+        elapsed = float('inf')
+        for i in range(args.repeat):
+            start = time.time()
+            func(races)
+            elapsed = min(elapsed, time.time() - start)
+        print('%-16s %10.2f %14d' % (name, elapsed * 1000, rows / elapsed))
+
+
+if __name__ == '__main__':
+    main()
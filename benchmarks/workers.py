@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+"""
+Times the ``results --csv`` pipeline on one file at several ``--workers``
+settings and reports the speedup over a single process. Without a file,
+a national-sized payload is generated.
+
+    python benchmarks/workers.py /path/to/20121106_national.json -w 1,2,4,8
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'elex_micro'))
+
+import generate  # noqa
+import parallel  # noqa
+import utils  # noqa
+
+
+def run(file_path, workers):
+    stdout = sys.stdout
+    sys.stdout = open(os.devnull, 'w')
+    try:
+        start = time.time()
+        if workers > 1:
+            parallel.output_csv(file_path, workers)
+        else:
+            electiondate, races = utils.open_file(file_path, stream=True)
+            utils.output_csv(utils.iter_results(electiondate, races))
+        return time.time() - start
+    finally:
+        sys.stdout.close()
+        sys.stdout = stdout
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark results --workers')
+    parser.add_argument('file', nargs='?', help='AP file to time; generated if not given')
+    parser.add_argument('-w', '--workers', default='1,2,4,8')
+    parser.add_argument('-r', '--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    file_path = args.file
+    if file_path is None:
+        # About the size of a national general election file.
+        handle, file_path = tempfile.mkstemp(suffix='.json')
+        with os.fdopen(handle, 'w') as writefile:
+            generate.write(generate.generate(races=1000, reporting_units=50, candidates=5), writefile)
+
+    try:
+        print('%s (%.1f MB)' % (file_path, os.path.getsize(file_path) / 1024.0 / 1024.0))
+        print('%8s %10s %8s' % ('workers', 'seconds', 'speedup'))
+
+        baseline = None
+        for workers in [int(w) for w in args.workers.split(',')]:
+            elapsed = min(run(file_path, workers) for i in range(args.repeat))
+            if baseline is None:
+                baseline = elapsed
+            print('%8d %10.3f %7.2fx' % (workers, elapsed, baseline / elapsed))
+    finally:
+        if args.file is None:
+            os.remove(file_path)
+
+if __name__ == '__main__':
+    main()
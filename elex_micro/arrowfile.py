@@ -0,0 +1,116 @@
+"""
+Parquet and Arrow output.
+
+Results are written with a typed ``KEY_ORDER`` schema: whole numbers as
+int64, pcts as float64, flags and ``winner`` as booleans, and everything
+else as strings. Rows are converted to Arrow a batch at a time as the
+results generator produces them, and each batch becomes one Parquet row
+group or one Arrow record batch. Requires pyarrow.
+"""
+try:
+    import pyarrow
+    import pyarrow.ipc
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+import utils
+
+# Rows per Parquet row group and Arrow record batch.
+ROW_GROUP_SIZE = 64 * 1024
+
+BOOL_KEYS = utils.BOOL_KEYS + ('winner',)
+
+
+def arrow_type(key):
+    if key in utils.INT_KEYS:
+        return pyarrow.int64()
+    if key in utils.FLOAT_KEYS:
+        return pyarrow.float64()
+    if key in BOOL_KEYS:
+        return pyarrow.bool_()
+    return pyarrow.string()
+
+
+def schema(fieldnames=utils.KEY_ORDER):
+    """
+    Returns the Arrow schema of results.
+    """
+    return pyarrow.schema([(k, arrow_type(k)) for k in fieldnames])
+
+
+def winner_flag(v):
+    """
+    ``winner`` is True for a called race and otherwise AP's raw flag, such
+    as 'N'. As a boolean, any flag other than True is False.
+    """
+    if v is None:
+        return None
+    return v is True
+
+
+def record_batch(payload, fieldnames=utils.KEY_ORDER):
+    """
+    Converts a list of results to an Arrow record batch.
+    """
+    rows = utils.row_tuples(payload, fieldnames)
+    columns = zip(*rows) if rows else [()] * len(fieldnames)
+
+    arrays = []
+    for k, column in zip(fieldnames, columns):
+        if k == 'winner':
+            column = map(winner_flag, column)
+        arrays.append(pyarrow.array(list(column), type=arrow_type(k)))
+    return pyarrow.RecordBatch.from_arrays(arrays, schema=schema(fieldnames))
+
+
+def record_batches(payload, fieldnames=utils.KEY_ORDER, batch_size=ROW_GROUP_SIZE):
+    for batch in utils.batches(payload, batch_size):
+        yield record_batch(batch, fieldnames)
+
+
+def write_parquet(payload, writefile, fieldnames=utils.KEY_ORDER, batch_size=ROW_GROUP_SIZE,
+                  compression='snappy'):
+    """
+    Writes results to the binary file ``writefile`` as Parquet, one row
+    group per ``batch_size`` rows.
+    """
+    if pyarrow is None:
+        raise ImportError('write_parquet requires pyarrow')
+
+    writer = pyarrow.parquet.ParquetWriter(writefile, schema(fieldnames), compression=compression)
+    try:
+        for batch in record_batches(payload, fieldnames, batch_size):
+            writer.write_table(pyarrow.Table.from_batches([batch]))
+    finally:
+        writer.close()
+
+
+def write_arrow(payload, writefile, fieldnames=utils.KEY_ORDER, batch_size=ROW_GROUP_SIZE):
+    """
+    Writes results to the binary file ``writefile`` in the Arrow IPC file
+    format, one record batch per ``batch_size`` rows.
+    """
+    if pyarrow is None:
+        raise ImportError('write_arrow requires pyarrow')
+
+    writer = pyarrow.ipc.new_file(writefile, schema(fieldnames))
+    try:
+        for batch in record_batches(payload, fieldnames, batch_size):
+            writer.write_batch(batch)
+    finally:
+        writer.close()
+
+
+def output_parquet(payload, fieldnames=utils.KEY_ORDER):
+    """
+    Dumps to Parquet on stdout.
+    """
+    write_parquet(payload, utils.binary_stdout(), fieldnames)
+
+
+def output_arrow(payload, fieldnames=utils.KEY_ORDER):
+    """
+    Dumps to an Arrow IPC file on stdout.
+    """
+    write_arrow(payload, utils.binary_stdout(), fieldnames)
@@ -0,0 +1,163 @@
+"""
+On-disk cache of transformed results.
+
+Results are stored as a stream of pickled batches of ``KEY_ORDER`` tuples,
+keyed by the AP ``timestamp`` and a hash of the file's contents, so a
+repeat run against an unchanged snapshot skips parsing and transforming
+entirely. The cache directory is kept under a size limit by evicting the
+least recently used entries.
+"""
+import hashlib
+import operator
+import os
+import re
+import tempfile
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+import compressed
+import jsonstream
+import utils
+
+DEFAULT_DIRECTORY = os.path.join(os.path.expanduser('~'), '.cache', 'elex-micro')
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Bump when the transform changes, so stale entries are never read.
+CACHE_VERSION = 2
+
+BATCH_SIZE = 1000
+SUFFIX = '.pickle'
+
+
+def snapshot_key(file_path, race_ids=None, states=None, offices=None):
+    """
+    Returns the cache key for an AP JSON file: its ``timestamp`` and a
+    hash of its contents and the requested races. A compressed file
+    is hashed decompressed, so it shares entries with the plain file.
+    """
+    race_filter = jsonstream.RaceFilter(race_ids, states, offices)
+    digest = hashlib.sha1()
+    digest.update(('%s:%s:' % (CACHE_VERSION, race_filter)).encode('utf-8'))
+
+    parser = jsonstream.RaceStream(raw=True)
+    with compressed.open_input(file_path) as readfile:
+        for chunk in iter(lambda: readfile.read(jsonstream.CHUNK_SIZE), b''):
+            if 'timestamp' not in parser.header and not parser.in_races:
+                parser.feed(chunk)
+            digest.update(chunk)
+
+    timestamp = re.sub(r'[^0-9A-Za-z]', '', parser.header.get('timestamp', None) or '')
+    return '%s-%s' % (timestamp, digest.hexdigest())
+
+
+class ResultCache(object):
+    """
+    A directory of cached result sets, at most ``max_bytes`` in total.
+    """
+
+    def __init__(self, directory=DEFAULT_DIRECTORY, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+
+    def key(self, file_path, race_ids=None, states=None, offices=None):
+        return snapshot_key(file_path, race_ids, states, offices)
+
+    def path(self, key):
+        return os.path.join(self.directory, key + SUFFIX)
+
+    def get(self, key):
+        """
+        Returns an iterator over the cached results for ``key``, or None if
+        they are not cached.
+        """
+        path = self.path(key)
+        try:
+            readfile = open(path, 'rb')
+        except IOError:
+            return None
+
+        # Mark the entry as recently used.
+        os.utime(path, None)
+        return self._read(readfile)
+
+    def _read(self, readfile):
+        with readfile:
+            while True:
+                try:
+                    batch = pickle.load(readfile)
+                except EOFError:
+                    return
+                for values, extra in batch:
+                    p = dict(zip(utils.KEY_ORDER, values))
+                    if extra:
+                        p.update(extra)
+                    yield p
+
+    def put(self, key, payload):
+        """
+        Yields the results in ``payload`` while writing them to the cache.
+        The entry only becomes visible once ``payload`` is exhausted.
+        """
+        row_values = operator.itemgetter(*utils.KEY_ORDER)
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+
+        try:
+            with os.fdopen(fd, 'wb') as writefile:
+                batch = []
+                for p in payload:
+                    extra = None
+                    if len(p) > len(utils.KEY_ORDER):
+                        extra = dict((k, v) for k, v in p.items() if k not in utils.KEY_ORDER)
+                    batch.append((row_values(p), extra))
+                    if len(batch) >= BATCH_SIZE:
+                        pickle.dump(batch, writefile, pickle.HIGHEST_PROTOCOL)
+                        batch = []
+                    yield p
+                if batch:
+                    pickle.dump(batch, writefile, pickle.HIGHEST_PROTOCOL)
+
+            os.rename(temp_path, self.path(key))
+
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+
+        self.evict()
+
+    def evict(self):
+        """
+        Removes the least recently used entries until the cache fits in
+        ``max_bytes``.
+        """
+        entries = []
+        total = 0
+        for name in os.listdir(self.directory):
+            if name.endswith(SUFFIX):
+                path = os.path.join(self.directory, name)
+                stat = os.stat(path)
+                entries.append((stat.st_mtime, stat.st_size, path))
+                total += stat.st_size
+
+        for mtime, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            os.remove(path)
+            total -= size
+
+
+def cached_results(cache, file_path, race_ids=None, states=None, offices=None, use_mmap=False):
+    """
+    Returns the results for an AP JSON file, from ``cache`` if the snapshot
+    has been seen before and otherwise by streaming and caching them.
+    """
+    key = cache.key(file_path, race_ids, states, offices)
+    payload = cache.get(key)
+    if payload is None:
+        electiondate, races = utils.open_file(file_path, race_ids, True, states, offices, use_mmap)
+        payload = cache.put(key, utils.iter_results(electiondate, races))
+    return payload
@@ -0,0 +1,190 @@
+"""
+Columnar (struct-of-arrays) results.
+
+``load_results_columnar`` returns one array per ``KEY_ORDER`` column
+instead of one dict per row. Numeric columns are NumPy arrays; every other
+column is dictionary-encoded as integer codes into its distinct values,
+so the race strings repeated on every row are stored once. Vote totals
+and pcts are computed with a vectorised group-by over the whole result
+set. Requires NumPy.
+"""
+import array
+import operator
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+import kernels
+import utils
+
+INT_KEYS = utils.INT_KEYS
+FLOAT_KEYS = utils.FLOAT_KEYS
+NUMERIC_KEYS = INT_KEYS + FLOAT_KEYS
+
+NAN = float('nan')
+
+
+class DictionaryColumn(object):
+    """
+    A dictionary-encoded column: ``codes`` index into ``values``, the
+    column's distinct values in order of first appearance.
+    """
+
+    def __init__(self, codes, values):
+        self.codes = codes
+        self.values = values
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, i):
+        return self.values[self.codes[i]]
+
+    def decode(self):
+        values = self.values
+        return [values[c] for c in self.codes]
+
+
+class ColumnarResults(object):
+    """
+    A result set stored as columns. Index it by column name; ``nulls``
+    holds the null mask of each integer column that has any nulls.
+    """
+
+    def __init__(self, columns, nulls):
+        self.columns = columns
+        self.nulls = nulls
+
+    def __len__(self):
+        return len(self.columns[utils.KEY_ORDER[0]])
+
+    def __getitem__(self, key):
+        return self.columns[key]
+
+    def row(self, i):
+        """
+        Returns row ``i`` as the dict ``load_results`` would have built.
+        """
+        row = {}
+        for k in utils.KEY_ORDER:
+            v = self.columns[k][i]
+            if k in INT_KEYS:
+                v = None if k in self.nulls and self.nulls[k][i] else int(v)
+            elif k in FLOAT_KEYS:
+                v = None if numpy.isnan(v) else float(v)
+            row[k] = v
+        return row
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.row(i)
+
+
+def as_numpy(column, dtype):
+    """
+    Views an ``array.array`` buffer as a NumPy array without copying.
+    """
+    if not len(column):
+        return numpy.zeros(0, dtype=dtype)
+    return numpy.frombuffer(column, dtype=dtype)
+
+
+class ColumnBuilder(object):
+    """
+    Accumulates rows into compact per-column buffers.
+    """
+
+    def __init__(self):
+        self.numeric = dict((k, array.array('d')) for k in NUMERIC_KEYS)
+        self.codes = dict((k, array.array('l')) for k in utils.KEY_ORDER if k not in NUMERIC_KEYS)
+        self.lookups = dict((k, {}) for k in self.codes)
+        self.values = dict((k, []) for k in self.codes)
+
+        self.keys = NUMERIC_KEYS + tuple(self.codes)
+        self.getter = operator.itemgetter(*self.keys)
+
+    def extend(self, rows):
+        """
+        Appends a batch of rows, such as one race. The batch is transposed
+        and each column is encoded with C-level ``map`` calls, so the only
+        per-value Python work is registering new distinct values.
+        """
+        if not rows:
+            return
+
+        for k, column in zip(self.keys, zip(*map(self.getter, rows))):
+            if k in self.numeric:
+                if None in column:
+                    column = [NAN if v is None else v for v in column]
+                self.numeric[k].extend(column)
+
+            else:
+                # Dictionary-encoded columns hold strings, booleans and
+                # None, so values can key the lookup directly.
+                lookup = self.lookups[k]
+                for v in set(column):
+                    if v not in lookup:
+                        lookup[v] = len(self.values[k])
+                        self.values[k].append(v)
+                self.codes[k].extend(map(lookup.__getitem__, column))
+
+    def build(self):
+        columns = {}
+        nulls = {}
+
+        for k, column in self.numeric.items():
+            values = as_numpy(column, numpy.float64)
+            if k in INT_KEYS:
+                mask = numpy.isnan(values)
+                if mask.any():
+                    nulls[k] = mask
+                    values = numpy.where(mask, 0, values)
+                values = values.astype(numpy.int64)
+            else:
+                values = values.copy()
+            columns[k] = values
+
+        for k, column in self.codes.items():
+            columns[k] = DictionaryColumn(
+                as_numpy(column, 'i%d' % column.itemsize).astype(numpy.int32),
+                self.values[k]
+            )
+
+        return ColumnarResults(columns, nulls)
+
+
+def compute_pcts_columnar(results):
+    """
+    Sets ``totalvotes`` and ``votepct`` for every row at once by summing
+    ``votecount`` over each raceid and reportingunitid pair.
+    """
+    raceids = results['raceid']
+    reportingunitids = results['reportingunitid']
+
+    groups = raceids.codes.astype(numpy.int64) * len(reportingunitids.values) + reportingunitids.codes
+    groups = numpy.unique(groups, return_inverse=True)[1]
+
+    totalvotes, votepct = kernels.group_pcts_numpy(results['votecount'], groups)
+
+    results.columns['totalvotes'] = totalvotes
+    results.columns['votepct'] = votepct
+    results.nulls.pop('totalvotes', None)
+    return results
+
+
+def load_results_columnar(electiondate, races):
+    """
+    Given a list of AP JSON races, returns candidate-reportingunit-race
+    results as a ``ColumnarResults``.
+    """
+    if numpy is None:
+        raise ImportError('load_results_columnar requires numpy')
+
+    builder = ColumnBuilder()
+    for r in races:
+        if r.get('reportingUnits', None):
+            builder.extend(list(utils.build_race(electiondate, r)))
+
+    return compute_pcts_columnar(builder.build())
@@ -0,0 +1,73 @@
+"""
+Compressed AP files.
+
+``open_input`` opens an AP file for reading as bytes. gzip and zstd files
+are recognised by their magic bytes and decompressed as they are read, so
+an archived poll can be fed straight to the parser without being
+decompressed to disk first. zstd requires zstandard.
+"""
+import gzip
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+GZIP_MAGIC = b'\x1f\x8b'
+ZSTD_MAGIC = b'\x28\xb5\x2f\xfd'
+
+
+def detect(file_path):
+    """
+    Returns 'gzip' or 'zstd' if the file at ``file_path`` is compressed,
+    and None otherwise.
+    """
+    with open(file_path, 'rb') as readfile:
+        magic = readfile.read(len(ZSTD_MAGIC))
+    if magic.startswith(GZIP_MAGIC):
+        return 'gzip'
+    if magic == ZSTD_MAGIC:
+        return 'zstd'
+    return None
+
+
+class ZstdFile(object):
+    """
+    A read-only file object over a zstd-compressed file.
+    """
+
+    def __init__(self, file_path):
+        if zstandard is None:
+            raise ImportError('Reading zstd files requires zstandard')
+        self.readfile = open(file_path, 'rb')
+        self.reader = zstandard.ZstdDecompressor().stream_reader(self.readfile)
+
+    @property
+    def closed(self):
+        return self.readfile.closed
+
+    def read(self, size=-1):
+        return self.reader.read(size)
+
+    def close(self):
+        self.reader.close()
+        self.readfile.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+def open_input(file_path):
+    """
+    Opens an AP file for reading as bytes, decompressing it on the fly if
+    it is gzip or zstd.
+    """
+    compression = detect(file_path)
+    if compression == 'gzip':
+        return gzip.open(file_path, 'rb')
+    if compression == 'zstd':
+        return ZstdFile(file_path)
+    return open(file_path, 'rb')
@@ -0,0 +1,516 @@
+#!/usr/bin/env python
+"""
+AP API fetcher.
+
+``APClient`` keeps one HTTP/1.1 connection to the API open across polls
+and election dates. Requests made while others are in flight are
+pipelined on it, and requests are sent again on a new connection if the
+server closes the old one. Each request carries the ``ETag`` and
+``Last-Modified`` of the last snapshot of its URL, so an unchanged
+snapshot costs a 304 and no body. Bodies are requested gzipped, and are
+decompressed and fed to the incremental race parser as they arrive. The
+races are counted and handed to a callback as they are parsed, rather
+than kept.
+
+``results-fetch`` polls one or more election dates and saves each
+changed snapshot, still compressed, where ``results`` can read it.
+
+Requires asyncio, so Python 3. Like ``results-server``, it is written
+with protocol callbacks rather than coroutines, so the module still
+compiles on Python 2.
+"""
+import argparse
+import collections
+import os
+import ssl
+import sys
+import tempfile
+import zlib
+
+try:
+    import asyncio
+except ImportError:
+    asyncio = None
+
+try:
+    from urllib.parse import urlencode
+except ImportError:
+    from urllib import urlencode
+
+import jsonstream
+import watch
+
+API_HOST = 'api.ap.org'
+ELECTION_PATH = '/v2/elections/%s'
+
+# Times a request is sent and dropped before it fails.
+MAX_ATTEMPTS = 2
+
+HEAD, BODY, CHUNK_SIZE, CHUNK, CHUNK_END, TRAILER, DONE = range(7)
+
+
+class FetchError(IOError):
+    pass
+
+
+class Snapshot(object):
+    """
+    The outcome of a fetch. ``count`` is the number of races read, or
+    None if the snapshot has not changed since the last fetch of its URL.
+    """
+
+    def __init__(self, status, headers, header=None, count=None):
+        self.status = status
+        self.headers = headers
+        self.header = header or {}
+        self.count = count
+
+    @property
+    def not_modified(self):
+        return self.status == 304
+
+    @property
+    def electiondate(self):
+        return self.header.get('electionDate', None)
+
+
+class Request(object):
+
+    def __init__(self, path, headers, future, race_filter=None, outfile=None, on_race=None):
+        self.path = path
+        self.headers = headers
+        self.future = future
+        self.race_filter = race_filter
+        self.outfile = outfile
+        self.on_race = on_race
+        self.attempts = 0
+
+    def encode(self, host):
+        lines = ['GET %s HTTP/1.1' % self.path, 'Host: %s' % host]
+        lines.extend('%s: %s' % item for item in sorted(self.headers.items()))
+        return ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1')
+
+
+class Response(object):
+    """
+    Incremental parser of one HTTP response. ``feed`` takes bytes from the
+    connection and returns any that belong to the next response. The body
+    is decompressed and parsed into races as it is read, each passed to
+    ``request.on_race`` if it is set, and copied to ``request.outfile`` as
+    received, if there is one.
+    """
+
+    def __init__(self, request):
+        self.request = request
+        self.state = HEAD
+        self.buf = b''
+        self.status = None
+        self.headers = {}
+        self.remaining = None
+        self.decoder = None
+        self.parser = None
+        self.count = 0
+        self.writefile = None
+        self.temp_path = None
+
+    @property
+    def done(self):
+        return self.state == DONE
+
+    @property
+    def keep_alive(self):
+        return self.headers.get('connection', '').lower() != 'close'
+
+    def feed(self, data):
+        self.buf += data
+        while self.state != DONE:
+            if self.state == HEAD:
+                end = self.buf.find(b'\r\n\r\n')
+                if end < 0:
+                    return b''
+                self.start(self.buf[:end].decode('latin-1'))
+                self.buf = self.buf[end + 4:]
+
+            elif self.state == BODY:
+                if self.remaining is None:
+                    # The body runs to the end of the connection.
+                    self.body(self.buf)
+                    self.buf = b''
+                    return b''
+                chunk = self.buf[:self.remaining]
+                self.buf = self.buf[self.remaining:]
+                self.remaining -= len(chunk)
+                self.body(chunk)
+                if self.remaining:
+                    return b''
+                self.finish()
+
+            elif self.state == CHUNK_SIZE:
+                end = self.buf.find(b'\r\n')
+                if end < 0:
+                    return b''
+                self.remaining = int(self.buf[:end].split(b';')[0], 16)
+                self.buf = self.buf[end + 2:]
+                self.state = CHUNK if self.remaining else TRAILER
+
+            elif self.state == CHUNK:
+                chunk = self.buf[:self.remaining]
+                self.buf = self.buf[self.remaining:]
+                self.remaining -= len(chunk)
+                self.body(chunk)
+                if self.remaining:
+                    return b''
+                self.state = CHUNK_END
+
+            elif self.state == CHUNK_END:
+                if len(self.buf) < 2:
+                    return b''
+                self.buf = self.buf[2:]
+                self.state = CHUNK_SIZE
+
+            elif self.state == TRAILER:
+                end = self.buf.find(b'\r\n')
+                if end < 0:
+                    return b''
+                line = self.buf[:end]
+                self.buf = self.buf[end + 2:]
+                if not line:
+                    self.finish()
+
+        data, self.buf = self.buf, b''
+        return data
+
+    def start(self, head):
+        lines = head.split('\r\n')
+        self.status = int(lines[0].split(' ', 2)[1])
+        for line in lines[1:]:
+            k, v = line.split(':', 1)
+            self.headers[k.strip().lower()] = v.strip()
+
+        if self.status != 200:
+            self.remaining = int(self.headers.get('content-length', 0))
+        elif 'content-length' in self.headers:
+            self.remaining = int(self.headers['content-length'])
+
+        if self.status == 200:
+            if self.headers.get('content-encoding', '').lower() == 'gzip':
+                self.decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+            self.parser = jsonstream.RaceStream(race_filter=self.request.race_filter)
+            if self.request.outfile:
+                directory = os.path.dirname(os.path.abspath(self.request.outfile))
+                fd, self.temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+                self.writefile = os.fdopen(fd, 'wb')
+
+        if self.headers.get('transfer-encoding', '').lower() == 'chunked':
+            self.state = CHUNK_SIZE
+        elif self.remaining == 0:
+            self.finish()
+        else:
+            self.state = BODY
+
+    def body(self, data):
+        if self.parser is None:
+            return
+        if self.writefile is not None:
+            self.writefile.write(data)
+        if self.decoder is not None:
+            data = self.decoder.decompress(data)
+        self.add(self.parser.feed(data))
+
+    def add(self, races):
+        self.count += len(races)
+        if self.request.on_race is not None:
+            for race in races:
+                self.request.on_race(race)
+
+    def finish(self):
+        """
+        Completes the response. Raises ``ValueError`` if the body is not a
+        complete AP file, or ``zlib.error`` if it is not valid gzip.
+        """
+        self.state = DONE
+        if self.parser is None:
+            return
+        try:
+            if self.decoder is not None:
+                self.add(self.parser.feed(self.decoder.flush()))
+            self.parser.close()
+        except (ValueError, zlib.error):
+            self.discard()
+            raise
+
+        if self.writefile is not None:
+            self.writefile.close()
+            watch.replace(self.temp_path, self.request.outfile)
+            self.writefile = None
+
+    def discard(self):
+        if self.writefile is not None:
+            self.writefile.close()
+            os.remove(self.temp_path)
+            self.writefile = None
+
+    def snapshot(self):
+        if self.parser is None:
+            return Snapshot(self.status, self.headers)
+        return Snapshot(self.status, self.headers, self.parser.header, self.count)
+
+
+if asyncio is not None:
+
+    class ClientProtocol(asyncio.Protocol):
+
+        def __init__(self, client):
+            self.client = client
+
+        def data_received(self, data):
+            self.client.received(self, data)
+
+        def eof_received(self):
+            self.client.eof(self)
+
+        def connection_lost(self, exc):
+            self.client.disconnected(self, exc)
+
+
+class APClient(object):
+    """
+    Fetches AP snapshots over one reused connection to ``host``.
+    """
+
+    def __init__(self, loop, host=API_HOST, port=None, use_ssl=True, api_key=None):
+        self.loop = loop
+        self.host = host
+        self.use_ssl = use_ssl
+        self.port = port or (443 if use_ssl else 80)
+        self.api_key = api_key
+
+        # ETag and Last-Modified of the last snapshot of each path.
+        self.validators = {}
+
+        self.queued = collections.deque()
+        self.pending = collections.deque()
+        self.response = None
+        self.protocol = None
+        self.transport = None
+        self.connecting = None
+        self.connections = 0
+
+    def fetch(self, path, params=None, race_filter=None, outfile=None, on_race=None):
+        """
+        Requests ``path`` and returns a future of its ``Snapshot``. If the
+        snapshot changed, each race is passed to ``on_race`` as it is
+        parsed, and if ``outfile`` is given the body is also saved there,
+        as received.
+        """
+        params = dict(params or {})
+        if self.api_key:
+            params['apiKey'] = self.api_key
+        if params:
+            path = '%s?%s' % (path, urlencode(sorted(params.items())))
+
+        headers = {
+            'Accept-Encoding': 'gzip',
+            'Connection': 'keep-alive',
+        }
+        etag, last_modified = self.validators.get(path, (None, None))
+        if etag:
+            headers['If-None-Match'] = etag
+        if last_modified:
+            headers['If-Modified-Since'] = last_modified
+
+        future = self.loop.create_future()
+        self.queued.append(Request(path, headers, future, race_filter, outfile, on_race))
+        self.send()
+        return future
+
+    def election(self, electiondate, level='ru', race_filter=None, outfile=None, on_race=None, **params):
+        """
+        Requests the results of an election date.
+        """
+        params.update(format='json', level=level)
+        return self.fetch(ELECTION_PATH % electiondate, params, race_filter, outfile, on_race)
+
+    def send(self):
+        if self.transport is None:
+            if self.queued and self.connecting is None:
+                self.connect()
+            return
+        while self.queued:
+            request = self.queued.popleft()
+            self.pending.append(request)
+            self.transport.write(request.encode(self.host))
+
+    def connect(self):
+        context = ssl.create_default_context() if self.use_ssl else None
+        self.connecting = self.loop.create_task(self.loop.create_connection(
+            lambda: ClientProtocol(self), self.host, self.port, ssl=context
+        ))
+        self.connecting.add_done_callback(self.connected)
+
+    def connected(self, task):
+        self.connecting = None
+        if task.exception() is not None:
+            while self.queued:
+                self.queued.popleft().future.set_exception(task.exception())
+            return
+        self.transport, self.protocol = task.result()
+        self.connections += 1
+        self.send()
+
+    def received(self, protocol, data):
+        if protocol is not self.protocol:
+            return
+        while data and self.pending:
+            if self.response is None:
+                self.response = Response(self.pending[0])
+            try:
+                data = self.response.feed(data)
+            except (ValueError, zlib.error) as e:
+                self.fail(self.pending.popleft(), e)
+                self.response.discard()
+                self.response = None
+                self.requeue()
+                return
+
+            if self.response.done:
+                request = self.pending.popleft()
+                response, self.response = self.response, None
+                self.complete(request, response)
+                if not response.keep_alive:
+                    self.requeue()
+                    return
+
+    def complete(self, request, response):
+        if request.future.done():
+            return
+        if response.status == 200:
+            self.validators[request.path] = (
+                response.headers.get('etag', None),
+                response.headers.get('last-modified', None)
+            )
+        if response.status in (200, 304):
+            request.future.set_result(response.snapshot())
+        else:
+            request.future.set_exception(FetchError('%s returned %d' % (request.path, response.status)))
+
+    def fail(self, request, exc):
+        if not request.future.done():
+            request.future.set_exception(exc)
+
+    def eof(self, protocol):
+        # A body without a length runs to the end of the connection.
+        response = self.response
+        if protocol is self.protocol and response is not None and response.state == BODY \
+                and response.remaining is None:
+            self.pending.popleft()
+            self.response = None
+            try:
+                response.finish()
+            except (ValueError, zlib.error) as e:
+                self.fail(response.request, e)
+            else:
+                self.complete(response.request, response)
+            self.requeue()
+
+    def disconnected(self, protocol, exc):
+        if protocol is not self.protocol:
+            return
+        self.protocol = None
+        self.transport = None
+        if self.response is not None:
+            self.response.discard()
+            self.response = None
+
+        # Requests still waiting for a response are sent again on a new
+        # connection, ahead of any queued since. Only the first was being
+        # answered, so only it has used up an attempt.
+        if self.pending:
+            self.pending[0].attempts += 1
+        while self.pending:
+            request = self.pending.pop()
+            if request.attempts >= MAX_ATTEMPTS:
+                self.fail(request, exc or FetchError('Connection closed before %s completed' % request.path))
+            else:
+                self.queued.appendleft(request)
+        self.send()
+
+    def requeue(self):
+        """
+        Closes the connection after a response the server will answer
+        nothing after, and sends the requests pipelined behind it again on
+        a new connection. None of them was answered, so none has used up
+        an attempt.
+        """
+        transport = self.transport
+        self.protocol = None
+        self.transport = None
+        transport.close()
+        while self.pending:
+            self.queued.appendleft(self.pending.pop())
+        self.send()
+
+    def close(self):
+        if self.transport is not None:
+            self.transport.close()
+        while self.queued:
+            self.fail(self.queued.popleft(), FetchError('Client closed'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Fetch AP Election results')
+    parser.add_argument('dates', nargs='+', metavar='DATE', help='Election dates, as YYYY-MM-DD')
+    parser.add_argument('--outdir', action='store', default='.',
+                        help='Directory for the snapshots, saved as YYYYMMDD.json, gzipped if the API sent gzip')
+    parser.add_argument('--api-key', action='store', default=os.environ.get('AP_API_KEY', None))
+    parser.add_argument('--host', action='store', default=API_HOST)
+    parser.add_argument('--port', action='store', type=int)
+    parser.add_argument('--no-ssl', action='store_true')
+    parser.add_argument('--level', action='store', default='ru')
+    parser.add_argument('--interval', action='store', type=float, default=30.0,
+                        help='Seconds from the end of one poll to the start of the next')
+    parser.add_argument('--once', action='store_true', help='Fetch once instead of polling')
+    args = parser.parse_args()
+
+    if asyncio is None:
+        parser.error('results-fetch requires Python 3')
+
+    loop = asyncio.new_event_loop()
+    client = APClient(loop, args.host, args.port, not args.no_ssl, args.api_key)
+
+    def poll():
+        futures = []
+        for date in args.dates:
+            outfile = os.path.join(args.outdir, '%s.json' % date.replace('-', ''))
+            future = client.election(date, args.level, outfile=outfile)
+            future.add_done_callback(lambda f, date=date: report(date, f))
+            futures.append(future)
+
+        # The next poll starts once this one is over, so a slow API never
+        # has two requests for the same snapshot in flight.
+        done = asyncio.gather(*futures, return_exceptions=True)
+        if args.once:
+            done.add_done_callback(lambda f: loop.stop())
+        else:
+            done.add_done_callback(lambda f: loop.call_later(args.interval, poll))
+
+    def report(date, future):
+        if future.exception() is not None:
+            sys.stderr.write('%s: %s\n' % (date, future.exception()))
+        elif future.result().not_modified:
+            sys.stderr.write('%s: not modified\n' % date)
+        else:
+            sys.stderr.write('%s: %d races\n' % (date, future.result().count))
+
+    loop.call_soon(poll)
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        client.close()
+        loop.close()
+
+
+if __name__ == '__main__':
+    main()
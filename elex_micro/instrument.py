@@ -0,0 +1,225 @@
+"""
+Pipeline instrumentation.
+
+``Stats`` records the wall time, count and peak RSS of each stage of the
+results pipeline:
+
+    read       reading, and decompressing, the input (bytes)
+    parse      parsing races out of it (races)
+    rollup     New England county rollups (races)
+    transform  building candidate-reportingunit-race rows (rows)
+    pcts       vote totals and pcts (rows)
+    write      everything else, the writers mostly (rows written)
+
+``iter_results`` runs the same race-at-a-time pipeline as
+``utils.open_file``/``utils.iter_results`` with a timer around each
+stage, and ``Stats.written`` counts the rows handed to a writer. With
+``--since`` both snapshots are read, so the earlier stages count both,
+while only the changed rows are written. Callbacks added with
+``register`` are called with the stage, the seconds and the count every
+time a stage is timed, so callers can feed their own metrics.
+
+Peak RSS is the process's high-water mark as of the last time the stage
+ran, since that is all ``getrusage`` reports.
+"""
+import collections
+import json
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+import compressed
+import jsonstream
+import utils
+
+STAGES = (
+    ('read', 'bytes'),
+    ('parse', 'races'),
+    ('rollup', 'races'),
+    ('transform', 'rows'),
+    ('pcts', 'rows'),
+    ('write', 'rows'),
+)
+
+callbacks = []
+
+
+def register(callback):
+    """
+    Calls ``callback(stage, seconds, count)`` each time a stage is timed.
+    """
+    callbacks.append(callback)
+
+
+def unregister(callback):
+    callbacks.remove(callback)
+
+
+def peak_rss():
+    """
+    Returns the peak resident set size of the process in bytes, or None if
+    it is not available.
+    """
+    if resource is None:
+        return None
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kilobytes, macOS bytes.
+    if sys.platform == 'darwin':
+        return maxrss
+    return maxrss * 1024
+
+
+class Stats(object):
+    """
+    Accumulates the timings of one run of the pipeline.
+    """
+
+    def __init__(self):
+        self.units = dict(STAGES)
+        self.seconds = dict((stage, 0.0) for stage, unit in STAGES)
+        self.counts = dict((stage, 0) for stage, unit in STAGES)
+        self.peak_rss = dict((stage, None) for stage, unit in STAGES)
+        self.total_seconds = None
+        self.rows_written = 0
+
+    def record(self, stage, seconds, count=0):
+        self.seconds[stage] += seconds
+        self.counts[stage] += count
+        self.peak_rss[stage] = peak_rss()
+        for callback in callbacks:
+            callback(stage, seconds, count)
+
+    def run(self, func):
+        """
+        Calls ``func``, which runs the pipeline, and records the time not
+        spent in the other stages as the write stage.
+        """
+        start = time.time()
+        try:
+            return func()
+        finally:
+            self.total_seconds = time.time() - start
+            others = sum(s for stage, s in self.seconds.items() if stage != 'write')
+            self.record('write', max(self.total_seconds - others, 0.0), self.rows_written)
+
+    def written(self, payload):
+        """
+        Yields the rows of ``payload``, counting them as written.
+        """
+        for row in payload:
+            self.rows_written += 1
+            yield row
+
+    def as_dict(self):
+        stages = collections.OrderedDict()
+        for stage, unit in STAGES:
+            seconds = self.seconds[stage]
+            stages[stage] = collections.OrderedDict((
+                ('seconds', round(seconds, 6)),
+                (unit, self.counts[stage]),
+                ('%s_per_second' % unit, round(self.counts[stage] / seconds, 1) if seconds else None),
+                ('peak_rss', self.peak_rss[stage]),
+            ))
+
+        return collections.OrderedDict((
+            ('seconds', round(self.total_seconds, 6) if self.total_seconds is not None else None),
+            ('rows', self.counts['write']),
+            ('peak_rss', peak_rss()),
+            ('stages', stages),
+        ))
+
+    def write(self, path='-'):
+        """
+        Appends the stats as a line of JSON to ``path``, or to stderr if
+        ``path`` is '-'.
+        """
+        line = json.dumps(self.as_dict()) + '\n'
+        if path == '-':
+            sys.stderr.write(line)
+            sys.stderr.flush()
+        else:
+            with open(path, 'a') as writefile:
+                writefile.write(line)
+
+
+class TimedFile(object):
+    """
+    Wraps a file to record each read as the read stage.
+    """
+
+    def __init__(self, readfile, stats):
+        self.readfile = readfile
+        self.stats = stats
+        self.seconds = 0.0
+
+    @property
+    def closed(self):
+        return self.readfile.closed
+
+    def read(self, size=-1):
+        start = time.time()
+        data = self.readfile.read(size)
+        seconds = time.time() - start
+        self.seconds += seconds
+        self.stats.record('read', seconds, len(data))
+        return data
+
+    def close(self):
+        self.readfile.close()
+
+
+def iter_results(stats, file_path, race_ids=None, states=None, offices=None, use_mmap=False):
+    """
+    Yields the results for an AP file, as ``get_results`` does without a
+    cache, recording each stage in ``stats``. A memory-mapped file has no
+    separate read stage; its pages are read as it is parsed.
+    """
+    race_filter = jsonstream.RaceFilter(race_ids, states, offices)
+    readfile = None
+
+    start = time.time()
+    if use_mmap and compressed.detect(file_path) is None:
+        reader = jsonstream.MappedRaceReader(file_path, race_filter=race_filter)
+    else:
+        readfile = TimedFile(compressed.open_input(file_path), stats)
+        reader = jsonstream.RaceReader(readfile, race_filter=race_filter)
+
+    def parsed(start, read_seconds, count):
+        if readfile is not None:
+            read_seconds = readfile.seconds - read_seconds
+        stats.record('parse', time.time() - start - read_seconds, count)
+
+    parsed(start, 0.0, 0)
+    electiondate = reader.electiondate
+    races = iter(reader)
+
+    while True:
+        start = time.time()
+        read_seconds = readfile.seconds if readfile is not None else 0.0
+        r = next(races, None)
+        if r is None:
+            parsed(start, read_seconds, 0)
+            return
+        parsed(start, read_seconds, 1)
+
+        if not r.get('reportingUnits', None):
+            continue
+
+        start = time.time()
+        r = utils.set_new_england_counties(r)
+        stats.record('rollup', time.time() - start, 1)
+
+        start = time.time()
+        payload = list(utils.build_race(electiondate, r, rollup=False))
+        stats.record('transform', time.time() - start, len(payload))
+
+        start = time.time()
+        payload = utils.set_race_pcts(payload)
+        stats.record('pcts', time.time() - start, len(payload))
+
+        for cru in payload:
+            yield cru
@@ -0,0 +1,455 @@
+"""
+Incremental parsing of AP results JSON.
+
+``RaceStream`` is fed the raw file a chunk at a time and hands back each
+element of the top-level ``races`` array as soon as it has been read in
+full. Every other top-level key (``electionDate``, ``timestamp``,
+``nextrequest``) is collected into ``RaceStream.header``. Element
+boundaries are found with a bracket-counting scan, and each race is
+decoded on its own with ``ujson``, so neither the raw file nor the full
+parsed tree is ever held in memory. With ``raw=True`` races are handed
+back undecoded, as the bytes of their JSON, for callers that decode them
+elsewhere. With a ``RaceFilter``, races that do not match are skipped
+without ever being decoded.
+
+``open_races(..., use_mmap=True)`` memory-maps the file instead and scans
+the mapping in place, so the only bytes copied are each race's own. Races
+are decoded with orjson when it is installed, and ujson otherwise.
+
+gzip and zstd files are decompressed as they are read. They cannot be
+mapped, so ``use_mmap`` is ignored for them.
+"""
+import collections
+import mmap
+import re
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+import ujson
+
+import compressed
+
+CHUNK_SIZE = 1024 * 1024
+
+# How far past the start of a race a memory-mapped parse looks for its end
+# before falling back to scanning brackets.
+SEARCH_WINDOW = 16 * 1024 * 1024
+
+# Patterns are written unrolled (no nested quantifiers over the same
+# characters) so a failed match never backtracks more than linearly.
+STRING = br'"[^"\\]*(?:\\.[^"\\]*)*"'
+NOT_BRACKET = br'[^"{}\[\]]*'
+FLAT = (
+    br'(?:\{' + NOT_BRACKET + br'(?:' + STRING + NOT_BRACKET + br')*\}|'
+    br'\[' + NOT_BRACKET + br'(?:' + STRING + NOT_BRACKET + br')*\])'
+)
+
+# Everything up to the next bracket that changes the nesting depth,
+# skipping over whole strings and flat containers such as candidates.
+SKIP_RE = re.compile(
+    NOT_BRACKET + br'(?:(?:' + STRING + br'|' + FLAT + br')' + NOT_BRACKET + br')*'
+)
+STRING_RE = re.compile(STRING)
+
+# An AP race ends by closing the last candidates array, the last
+# reporting unit, the reportingUnits array and then the race itself.
+RACE_END_RE = re.compile(br'\]\s*\}\s*\]\s*\}')
+SCALAR_RE = re.compile(br'[^\s,}\]]+')
+WHITESPACE_RE = re.compile(br'\s*')
+
+OPEN_BRACKETS = (b'{', b'[')
+
+# Returned by ``RaceStream._race`` for a race the filter rejected.
+SKIPPED = object()
+
+# Decoder for the races of a memory-mapped file. Other reads decode
+# races with ujson.
+mapped_loads = orjson.loads if orjson is not None else ujson.loads
+
+# Parser states.
+START, KEY, COLON, VALUE, AFTER_VALUE, RACE, AFTER_RACE, DONE = range(8)
+
+
+def field_re(key):
+    """
+    Matches the first string value of ``key`` in raw JSON.
+    """
+    return re.compile(br'"' + key + br'"\s*:\s*"([^"\\]*)"')
+
+
+class RaceFilter(object):
+    """
+    Selects races by ``raceID``, state postal code and ``officeID``. Each
+    criterion is a collection of accepted values, or None to accept any;
+    a race must match every criterion given.
+
+    A race's state is its own ``statePostal`` if it has one, and otherwise
+    that of its first reporting unit.
+    """
+    FIELDS = (
+        ('race_ids', 'raceID'),
+        ('states', 'statePostal'),
+        ('offices', 'officeID'),
+    )
+
+    def __init__(self, race_ids=None, states=None, offices=None):
+        self.race_ids = frozenset(race_ids) if race_ids else None
+        self.states = frozenset(states) if states else None
+        self.offices = frozenset(offices) if offices else None
+
+        self.criteria = []
+        for attr, key in self.FIELDS:
+            values = getattr(self, attr)
+            if values is not None:
+                self.criteria.append((key, field_re(key.encode('ascii')), values))
+
+    def __bool__(self):
+        return bool(self.criteria)
+
+    __nonzero__ = __bool__
+
+    def __str__(self):
+        return ';'.join(
+            '%s=%s' % (key, ','.join(sorted(values)))
+            for key, regex, values in self.criteria
+        )
+
+    def match(self, race):
+        """
+        Tests a decoded race.
+        """
+        for key, regex, values in self.criteria:
+            value = race.get(key, None)
+            if value is None and key == 'statePostal':
+                units = race.get('reportingUnits', None) or [{}]
+                value = units[0].get(key, None)
+            if value not in values:
+                return False
+        return True
+
+    def match_raw(self, race):
+        """
+        Tests the raw JSON of a race without decoding it. AP writes a race's
+        own keys ahead of its reporting units, so the first occurrence of
+        each key is the race's, or failing that its first reporting unit's.
+        """
+        for key, regex, values in self.criteria:
+            m = regex.search(race)
+            if m is None or m.group(1).decode('utf-8') not in values:
+                return False
+        return True
+
+
+class RaceStream(object):
+    """
+    Push parser for an AP results file. Call ``feed`` with successive
+    chunks of the file; it returns the list of races completed by that
+    chunk. Call ``close`` once the file is exhausted.
+
+    Only races accepted by ``race_filter`` are returned, if one is given.
+    Races are decoded with ``loads``.
+    """
+
+    def __init__(self, raw=False, race_filter=None, search_window=None, loads=ujson.loads):
+        self.raw = raw
+        self.loads = loads
+        self.race_filter = race_filter or None
+        self.search_window = search_window
+        self.header = {}
+        self.in_races = False
+        self.buf = b''
+        self.pos = 0
+        self.state = START
+        self.key = None
+
+        # Resumable scan state for a container that spans chunks.
+        self.scan_pos = None
+        self.depth = 0
+
+    def feed(self, data):
+        if self.pos:
+            self.buf = self.buf[self.pos:]
+            if self.scan_pos is not None:
+                self.scan_pos -= self.pos
+            self.pos = 0
+        self.buf += data
+        return list(self._parse())
+
+    def close(self):
+        if self.state != DONE:
+            raise ValueError('Unexpected end of AP JSON data')
+
+    def _ws(self):
+        self.pos = WHITESPACE_RE.match(self.buf, self.pos).end()
+        return self.buf[self.pos:self.pos + 1]
+
+    def _value_end(self):
+        """
+        Returns the end offset of the JSON value starting at ``self.pos``,
+        or None if the buffer does not hold all of it yet.
+        """
+        buf = self.buf
+        ch = buf[self.pos:self.pos + 1]
+
+        if ch == b'"':
+            m = STRING_RE.match(buf, self.pos)
+            return m.end() if m else None
+
+        if ch not in OPEN_BRACKETS:
+            m = SCALAR_RE.match(buf, self.pos)
+            if m and m.end() < len(buf):
+                return m.end()
+            return None
+
+        if self.scan_pos is None:
+            self.scan_pos = self.pos + 1
+            self.depth = 1
+
+        i = self.scan_pos
+        depth = self.depth
+        end = len(buf)
+
+        while True:
+            i = SKIP_RE.match(buf, i).end()
+            if i >= end or buf[i:i + 1] == b'"':
+                # Ran out of data, possibly inside a string.
+                self.scan_pos = i
+                self.depth = depth
+                return None
+            if buf[i:i + 1] in OPEN_BRACKETS:
+                depth += 1
+            else:
+                depth -= 1
+            i += 1
+            if depth == 0:
+                self.scan_pos = None
+                return i
+
+    def _race(self):
+        """
+        Decodes the race starting at ``self.pos``, or returns None if the
+        buffer does not hold all of it yet. Returns ``SKIPPED`` if the race
+        was read but rejected by the filter.
+        """
+        end = None
+        race = None
+
+        if self.scan_pos is None and not self.raw and self.race_filter is None:
+            # Fast path: guess the end of the race from the AP layout and
+            # confirm it. A value has exactly one end, so if the slice
+            # decodes the guess was right. Without decoding there is no
+            # cheaper way to tell a guess that ends inside a name, such as
+            # "[{[]}]}", from the real end than scanning the race, so raw
+            # and filtered reads go straight to ``_value_end``.
+            if self.search_window is None:
+                m = RACE_END_RE.search(self.buf, self.pos)
+            else:
+                m = RACE_END_RE.search(self.buf, self.pos, self.pos + self.search_window)
+            if m:
+                try:
+                    race = self.loads(self.buf[self.pos:m.end()])
+                except ValueError:
+                    pass
+                else:
+                    end = m.end()
+
+        if end is None:
+            end = self._value_end()
+            if end is None:
+                return None
+
+        raw = self.buf[self.pos:end]
+        self.pos = end
+
+        if self.race_filter is not None and not self.race_filter.match_raw(raw):
+            return SKIPPED
+        if self.raw:
+            return raw
+        if race is None:
+            race = self.loads(raw)
+        return race
+
+    def _parse(self):
+        while True:
+            ch = self._ws()
+            if not ch:
+                return
+
+            if self.state == START:
+                if ch != b'{':
+                    raise ValueError('AP JSON must be an object')
+                self.pos += 1
+                self.state = KEY
+
+            elif self.state == KEY:
+                if ch == b'}':
+                    self.pos += 1
+                    self.state = DONE
+                    continue
+                end = self._value_end()
+                if end is None:
+                    return
+                self.key = ujson.loads(self.buf[self.pos:end])
+                self.pos = end
+                self.state = COLON
+
+            elif self.state == COLON:
+                if ch != b':':
+                    raise ValueError('Expected ":" in AP JSON')
+                self.pos += 1
+                self.state = VALUE
+
+            elif self.state == VALUE:
+                if self.key == 'races' and ch == b'[':
+                    self.pos += 1
+                    self.in_races = True
+                    self.state = RACE
+                    continue
+                end = self._value_end()
+                if end is None:
+                    return
+                self.header[self.key] = ujson.loads(self.buf[self.pos:end])
+                self.pos = end
+                self.state = AFTER_VALUE
+
+            elif self.state == AFTER_VALUE:
+                self.pos += 1
+                self.state = KEY if ch == b',' else DONE
+
+            elif self.state == RACE:
+                if ch == b']':
+                    self.pos += 1
+                    self.in_races = False
+                    self.state = AFTER_VALUE
+                    continue
+                race = self._race()
+                if race is None:
+                    return
+                self.state = AFTER_RACE
+                if race is not SKIPPED:
+                    yield race
+
+            elif self.state == AFTER_RACE:
+                self.pos += 1
+                if ch == b']':
+                    self.in_races = False
+                    self.state = AFTER_VALUE
+                else:
+                    self.state = RACE
+
+            else:
+                return
+
+
+class RaceReader(object):
+    """
+    Iterates over the races in an open AP results file, reading it in
+    ``chunk_size`` pieces. The header is read eagerly on construction
+    so ``electiondate`` is available before the first race; the file is
+    closed once the races are exhausted.
+    """
+
+    def __init__(self, readfile, chunk_size=CHUNK_SIZE, raw=False, race_filter=None):
+        self.readfile = readfile
+        self.chunk_size = chunk_size
+        self.parser = RaceStream(raw=raw, race_filter=race_filter)
+        self.pending = collections.deque()
+
+        # AP puts the header keys ahead of the races array. If a file
+        # does not, races read while looking for them are buffered.
+        while 'electionDate' not in self.parser.header:
+            if not self._read():
+                break
+
+    @property
+    def header(self):
+        return self.parser.header
+
+    @property
+    def electiondate(self):
+        return self.parser.header.get('electionDate', None)
+
+    def _read(self):
+        data = self.readfile.read(self.chunk_size)
+        if not data:
+            self.parser.close()
+            self.close()
+            return False
+        self.pending.extend(self.parser.feed(data))
+        return True
+
+    def close(self):
+        self.readfile.close()
+
+    def __iter__(self):
+        while True:
+            while self.pending:
+                yield self.pending.popleft()
+            if self.readfile.closed or not self._read():
+                return
+
+
+class MappedRaceReader(RaceReader):
+    """
+    Iterates over the races in a memory-mapped AP results file. The parser
+    runs over the whole mapping as its buffer, so the file is never read
+    into memory, and races are produced one at a time as they are consumed.
+    """
+
+    def __init__(self, file_path, raw=False, race_filter=None):
+        self.readfile = open(file_path, 'rb')
+        self.buffer = mmap.mmap(self.readfile.fileno(), 0, access=mmap.ACCESS_READ)
+        self.parser = RaceStream(raw=raw, race_filter=race_filter, search_window=SEARCH_WINDOW,
+                                 loads=mapped_loads)
+        self.parser.buf = self.buffer
+        self.races = self.parser._parse()
+        self.pending = collections.deque()
+
+        while 'electionDate' not in self.parser.header:
+            if not self._read():
+                break
+
+    def _read(self):
+        for race in self.races:
+            self.pending.append(race)
+            return True
+        self.parser.close()
+        self.close()
+        return False
+
+    def close(self):
+        self.buffer.close()
+        self.readfile.close()
+
+
+def open_races(file_path, chunk_size=CHUNK_SIZE, raw=False, race_filter=None, use_mmap=False):
+    """
+    Opens an AP JSON file for incremental parsing.
+    """
+    if use_mmap and compressed.detect(file_path) is None:
+        return MappedRaceReader(file_path, raw=raw, race_filter=race_filter)
+    return RaceReader(compressed.open_input(file_path), chunk_size=chunk_size, raw=raw,
+                      race_filter=race_filter)
+
+
+def load_mapped(file_path):
+    """
+    Decodes a whole AP JSON file through a memory map. orjson decodes the
+    mapping in place; ujson needs it copied into a string first.
+    Compressed files are decompressed into memory instead.
+    """
+    if compressed.detect(file_path) is not None:
+        with compressed.open_input(file_path) as readfile:
+            return ujson.loads(readfile.read())
+
+    with open(file_path, 'rb') as readfile:
+        buf = mmap.mmap(readfile.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            if orjson is not None:
+                return orjson.loads(memoryview(buf))
+            return ujson.loads(buf[:])
+        finally:
+            buf.close()
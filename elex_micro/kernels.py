@@ -0,0 +1,83 @@
+"""
+Batched vote total and vote pct kernels.
+
+``group_pcts`` takes a column of vote counts and a parallel column of
+group keys, such as reportingunitids or (raceid, reportingunitid) pairs,
+and returns every row's group total and share of that total in one pass.
+It uses NumPy when it is installed and the batch is big enough to pay for
+the array conversions, and plain Python otherwise.
+"""
+import itertools
+
+try:
+    from itertools import imap
+except ImportError:
+    imap = map
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# Batches smaller than this are faster in plain Python.
+NUMPY_THRESHOLD = 2000
+
+
+def group_pcts_python(votecount, groups):
+    """
+    Pure-Python kernel. Returns lists of totals and pcts, with None as the
+    pct of a row whose group has no votes.
+    """
+    sums = {}
+    for g, v in zip(groups, votecount):
+        sums[g] = sums.get(g, 0) + v
+
+    totals = list(map(sums.__getitem__, groups))
+    pcts = [float(v) / t if t else None for v, t in zip(votecount, totals)]
+    return totals, pcts
+
+
+def group_codes(groups):
+    """
+    Encodes hashable group keys as integers without a Python-level loop.
+    Codes are unique per group but not contiguous.
+    """
+    index = {}
+    return numpy.fromiter(
+        imap(index.setdefault, groups, itertools.count()),
+        dtype=numpy.int64,
+        count=len(groups)
+    )
+
+
+def group_pcts_numpy(votecount, codes):
+    """
+    NumPy kernel over integer group ``codes``. Returns int64 totals and
+    float64 pcts, with NaN as the pct of a row whose group has no votes.
+    """
+    votecount = numpy.asarray(votecount, dtype=numpy.int64)
+    codes = numpy.asarray(codes, dtype=numpy.int64)
+
+    sums = numpy.bincount(codes, weights=votecount)
+    totals = sums.astype(numpy.int64)[codes]
+
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        pcts = votecount / totals.astype(numpy.float64)
+    pcts[totals == 0] = numpy.nan
+    return totals, pcts
+
+
+def group_pcts(votecount, groups):
+    """
+    Returns lists of each row's group total and pct, with None as the pct
+    of a row whose group has no votes.
+    """
+    if numpy is None or len(groups) < NUMPY_THRESHOLD:
+        return group_pcts_python(votecount, groups)
+
+    totals, pcts = group_pcts_numpy(votecount, group_codes(groups))
+    zero = numpy.flatnonzero(totals == 0)
+    pcts = pcts.tolist()
+    for i in zero:
+        pcts[i] = None
+    return totals.tolist(), pcts
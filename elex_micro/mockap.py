@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+"""
+Local stand-in for the AP elections API.
+
+``MockAPServer`` answers ``GET /v2/elections/YYYY-MM-DD`` with an AP file
+from a directory, ``tests/data`` by default, so ``fetch`` can be run and
+tested offline. Like the API, it keeps connections alive, sends ``ETag``
+and ``Last-Modified``, answers a matching ``If-None-Match`` or
+``If-Modified-Since`` with a 304, and gzips the body, chunked, if the
+client accepts gzip. Query parameters are ignored.
+
+Requires asyncio, so Python 3.
+"""
+import argparse
+import email.utils
+import glob
+import gzip
+import hashlib
+import io
+import os
+import re
+import sys
+
+try:
+    import asyncio
+except ImportError:
+    asyncio = None
+
+DATA_DIRECTORY = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tests', 'data')
+
+ELECTION_PATH_RE = re.compile(r'^/v2/elections/(\d{4})-(\d{2})-(\d{2})$')
+
+CHUNK_SIZE = 16 * 1024
+
+REASONS = {
+    200: 'OK',
+    304: 'Not Modified',
+    400: 'Bad Request',
+    404: 'Not Found',
+}
+
+
+class MockAPServer(object):
+    """
+    Serves the AP files in ``directory``. An election date is served from
+    ``files[date]`` if given, or else from the first file whose name
+    starts with the date as YYYYMMDD.
+    """
+
+    def __init__(self, loop, directory=DATA_DIRECTORY, files=None, keep_alive=True):
+        self.loop = loop
+        self.directory = directory
+        self.files = files or {}
+        self.keep_alive = keep_alive
+        self.server = None
+
+        # Every request head received, and every connection accepted,
+        # for tests to inspect.
+        self.requests = []
+        self.connections = 0
+
+    def find(self, path):
+        m = ELECTION_PATH_RE.match(path)
+        if not m:
+            return None
+        electiondate = '-'.join(m.groups())
+        if electiondate in self.files:
+            return self.files[electiondate]
+        matches = sorted(glob.glob(os.path.join(self.directory, '%s*.json' % ''.join(m.groups()))))
+        return matches[0] if matches else None
+
+    def respond(self, path, headers):
+        """
+        Returns the status, headers and body for a GET of ``path``.
+        """
+        file_path = self.find(path.split('?', 1)[0])
+        if file_path is None:
+            return 404, {}, b'Not found\n'
+
+        with open(file_path, 'rb') as readfile:
+            data = readfile.read()
+        mtime = int(os.stat(file_path).st_mtime)
+        response_headers = {
+            'Content-Type': 'application/json',
+            'ETag': '"%s"' % hashlib.sha1(data).hexdigest(),
+            'Last-Modified': email.utils.formatdate(mtime, usegmt=True),
+        }
+
+        if 'if-none-match' in headers:
+            if headers['if-none-match'] == response_headers['ETag']:
+                return 304, response_headers, b''
+        elif 'if-modified-since' in headers:
+            since = email.utils.parsedate_tz(headers['if-modified-since'])
+            if since is not None and mtime <= email.utils.mktime_tz(since):
+                return 304, response_headers, b''
+
+        if 'gzip' in headers.get('accept-encoding', ''):
+            compressed = io.BytesIO()
+            with gzip.GzipFile(fileobj=compressed, mode='wb') as writefile:
+                writefile.write(data)
+            data = compressed.getvalue()
+            response_headers['Content-Encoding'] = 'gzip'
+        return 200, response_headers, data
+
+    def start(self, host='127.0.0.1', port=0):
+        """
+        Starts listening and returns the bound port.
+        """
+        self.server = self.loop.run_until_complete(
+            self.loop.create_server(lambda: MockAPProtocol(self), host, port)
+        )
+        return self.server.sockets[0].getsockname()[1]
+
+    def stop(self):
+        if self.server is not None:
+            self.server.close()
+
+
+if asyncio is not None:
+
+    class MockAPProtocol(asyncio.Protocol):
+        """
+        An HTTP/1.1 connection that answers GET requests in order, as long
+        as the client keeps it open. Pipelined requests are answered one
+        after another.
+        """
+
+        def __init__(self, server):
+            self.server = server
+            self.transport = None
+            self.buf = b''
+
+        def connection_made(self, transport):
+            self.transport = transport
+            self.server.connections += 1
+
+        def data_received(self, data):
+            self.buf += data
+            while b'\r\n\r\n' in self.buf and not self.transport.is_closing():
+                head, self.buf = self.buf.split(b'\r\n\r\n', 1)
+                lines = head.decode('latin-1').split('\r\n')
+                headers = {}
+                for line in lines[1:]:
+                    k, v = line.split(':', 1)
+                    headers[k.strip().lower()] = v.strip()
+                self.server.requests.append((lines[0], headers))
+
+                parts = lines[0].split()
+                if len(parts) != 3 or parts[0] != 'GET':
+                    self.send(400, {}, b'Bad request\n', False)
+                    return
+                keep_alive = self.server.keep_alive and headers.get('connection', '').lower() != 'close'
+                self.send(*self.server.respond(parts[1], headers), keep_alive=keep_alive)
+
+        def send(self, status, headers, body, keep_alive):
+            headers = dict(headers)
+            headers['Connection'] = 'keep-alive' if keep_alive else 'close'
+            chunked = headers.get('Content-Encoding') == 'gzip'
+            if chunked:
+                headers['Transfer-Encoding'] = 'chunked'
+            else:
+                headers['Content-Length'] = str(len(body))
+
+            head = ['HTTP/1.1 %d %s' % (status, REASONS[status])]
+            head.extend('%s: %s' % item for item in sorted(headers.items()))
+            self.transport.write(('\r\n'.join(head) + '\r\n\r\n').encode('latin-1'))
+
+            if chunked:
+                for i in range(0, len(body), CHUNK_SIZE):
+                    chunk = body[i:i + CHUNK_SIZE]
+                    self.transport.write(b'%x\r\n' % len(chunk) + chunk + b'\r\n')
+                self.transport.write(b'0\r\n\r\n')
+            else:
+                self.transport.write(body)
+
+            if not keep_alive:
+                self.transport.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve AP files as a stand-in for the AP elections API')
+    parser.add_argument('--directory', action='store', default=DATA_DIRECTORY)
+    parser.add_argument('--host', action='store', default='127.0.0.1')
+    parser.add_argument('--port', action='store', type=int, default=8001)
+    args = parser.parse_args()
+
+    if asyncio is None:
+        parser.error('mockap requires Python 3')
+
+    loop = asyncio.new_event_loop()
+    server = MockAPServer(loop, args.directory)
+    port = server.start(args.host, args.port)
+    sys.stderr.write('Serving %s on http://%s:%d/\n' % (args.directory, args.host, port))
+
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        loop.close()
+
+
+if __name__ == '__main__':
+    main()
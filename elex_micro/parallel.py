@@ -0,0 +1,202 @@
+"""
+Race-sharded results pipeline.
+
+Races are independent of each other, so the parent process splits the
+raw ``races`` array into shards without decoding it, a process pool
+decodes and transforms each shard and renders it to output text, and the
+parent writes the rendered shards back out in the original race order.
+"""
+import collections
+import multiprocessing
+import sys
+
+import ujson
+
+import jsonstream
+import pgcopy
+import utils
+
+# Bytes of raw race JSON handed to a worker at a time.
+SHARD_SIZE = 1024 * 1024
+
+
+def shard_races(races, shard_size=SHARD_SIZE):
+    """
+    Groups raw race JSON into lists of roughly ``shard_size`` bytes.
+    """
+    shard = []
+    size = 0
+    for r in races:
+        shard.append(r)
+        size += len(r)
+        if size >= shard_size:
+            yield shard
+            shard = []
+            size = 0
+    if shard:
+        yield shard
+
+
+def render_csv(payload):
+    """
+    Renders results as CSV rows without a header.
+    """
+    return utils.format_csv(list(payload))
+
+
+def render_tsv(payload):
+    """
+    Renders results as TSV rows without a header.
+    """
+    return utils.format_tsv(list(payload))
+
+
+def render_json(payload):
+    """
+    Renders results as comma-separated JSON objects, without the
+    enclosing array.
+    """
+    return utils.format_json(payload)
+
+
+def render_jsonl(payload):
+    """
+    Renders results as JSON Lines.
+    """
+    return utils.format_jsonl(payload)
+
+
+def render_pgcopy(payload):
+    """
+    Renders results in Postgres ``COPY ... FORMAT text``.
+    """
+    return pgcopy.format_text(list(payload))
+
+
+def render_pgbinary(payload):
+    """
+    Renders results as Postgres ``COPY ... FORMAT binary`` tuples.
+    """
+    return pgcopy.format_binary(list(payload))
+
+
+RENDERERS = {
+    'csv': render_csv,
+    'tsv': render_tsv,
+    'json': render_json,
+    'jsonl': render_jsonl,
+    'pgcopy': render_pgcopy,
+    'pgbinary': render_pgbinary,
+}
+
+
+def transform_shard(electiondate, shard, output):
+    """
+    Decodes, transforms and renders one shard of raw races.
+    """
+    races = (ujson.loads(r) for r in shard)
+    return RENDERERS[output](utils.iter_results(electiondate, races))
+
+
+def iter_rendered(file_path, workers, output='csv', race_ids=None,
+                  shard_size=SHARD_SIZE, states=None, offices=None, use_mmap=False):
+    """
+    Yields the rendered output of each shard of the file, in race order.
+    At most two shards per worker are in flight at once, so memory stays
+    bounded however large the file is. Races are filtered in the parent,
+    so workers are only sent the races that are wanted.
+    """
+    race_filter = jsonstream.RaceFilter(race_ids, states, offices)
+    races = jsonstream.open_races(file_path, raw=True, race_filter=race_filter, use_mmap=use_mmap)
+    electiondate = races.electiondate
+
+    pool = multiprocessing.Pool(workers)
+    pending = collections.deque()
+
+    try:
+        for shard in shard_races(races, shard_size):
+            pending.append(pool.apply_async(
+                transform_shard,
+                (electiondate, shard, output)
+            ))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().get()
+
+        while pending:
+            yield pending.popleft().get()
+
+    finally:
+        pool.terminate()
+        pool.join()
+
+
+def output_csv(file_path, workers, race_ids=None, states=None, offices=None, use_mmap=False):
+    """
+    Dumps results to a CSV on stdout using a pool of ``workers``.
+    """
+    utils.write_csv((), sys.stdout)
+
+    chunks = iter_rendered(file_path, workers, 'csv', race_ids, states=states, offices=offices,
+                           use_mmap=use_mmap)
+    utils.write_chunks(chunks, sys.stdout)
+
+
+def output_tsv(file_path, workers, race_ids=None, states=None, offices=None, use_mmap=False):
+    """
+    Dumps results to a TSV on stdout using a pool of ``workers``.
+    """
+    utils.write_tsv((), sys.stdout)
+
+    chunks = iter_rendered(file_path, workers, 'tsv', race_ids, states=states, offices=offices,
+                           use_mmap=use_mmap)
+    utils.write_chunks(chunks, sys.stdout)
+
+
+def output_json(file_path, workers, race_ids=None, states=None, offices=None, use_mmap=False):
+    """
+    Dumps results to JSON on stdout using a pool of ``workers``.
+    """
+    sys.stdout.write('[')
+    first = True
+    chunks = iter_rendered(file_path, workers, 'json', race_ids, states=states, offices=offices,
+                           use_mmap=use_mmap)
+    for chunk in chunks:
+        if chunk:
+            if not first:
+                sys.stdout.write(',')
+            sys.stdout.write(chunk)
+            first = False
+    sys.stdout.write(']')
+
+
+def output_jsonl(file_path, workers, race_ids=None, states=None, offices=None, use_mmap=False):
+    """
+    Dumps results to JSON Lines on stdout using a pool of ``workers``.
+    """
+    chunks = iter_rendered(file_path, workers, 'jsonl', race_ids, states=states, offices=offices,
+                           use_mmap=use_mmap)
+    utils.write_chunks(chunks, sys.stdout)
+
+
+def output_pgcopy(file_path, workers, race_ids=None, states=None, offices=None, use_mmap=False):
+    """
+    Dumps results in Postgres ``COPY ... FORMAT text`` on stdout using a
+    pool of ``workers``.
+    """
+    chunks = iter_rendered(file_path, workers, 'pgcopy', race_ids, states=states, offices=offices,
+                           use_mmap=use_mmap)
+    utils.write_chunks(chunks, sys.stdout)
+
+
+def output_pgbinary(file_path, workers, race_ids=None, states=None, offices=None, use_mmap=False):
+    """
+    Dumps results in Postgres ``COPY ... FORMAT binary`` on stdout using a
+    pool of ``workers``.
+    """
+    writefile = utils.binary_stdout()
+    writefile.write(pgcopy.BINARY_HEADER)
+    chunks = iter_rendered(file_path, workers, 'pgbinary', race_ids, states=states, offices=offices,
+                           use_mmap=use_mmap)
+    utils.write_chunks(chunks, writefile)
+    writefile.write(pgcopy.BINARY_TRAILER)
+    writefile.flush()
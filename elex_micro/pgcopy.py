@@ -0,0 +1,238 @@
+"""
+PostgreSQL ``COPY`` output.
+
+Results can be written in either of the formats ``COPY ... FROM STDIN``
+reads natively: ``text``, which is tab-separated with ``\\N`` for nulls,
+and ``binary``, which the server loads without parsing any text at all.
+``upsert_sql`` returns a psql script that copies a snapshot into a staging
+table and upserts it into the results table on ``utils.ROW_KEYS``.
+"""
+import csv
+import itertools
+import struct
+import sys
+
+import utils
+
+try:
+    string_types = basestring
+except NameError:
+    string_types = str
+
+# Postgres type of each column. Columns not listed are text.
+COLUMN_TYPES = dict(
+    [(k, 'bigint') for k in utils.INT_KEYS] +
+    [(k, 'double precision') for k in utils.FLOAT_KEYS] +
+    [(k, 'boolean') for k in utils.BOOL_KEYS]
+)
+
+NULL = '\\N'
+NONE_TYPE = type(None)
+
+BINARY_SIGNATURE = b'PGCOPY\n\xff\r\n\x00'
+BINARY_HEADER = BINARY_SIGNATURE + struct.pack('>ii', 0, 0)
+BINARY_TRAILER = struct.pack('>h', -1)
+BINARY_NULL = struct.pack('>i', -1)
+
+INT8 = struct.Struct('>iq')
+FLOAT8 = struct.Struct('>id')
+BOOL = struct.Struct('>i?')
+LENGTH = struct.Struct('>i')
+
+CREATE_TABLE_SQL = """CREATE TABLE IF NOT EXISTS {table} (
+{columns},
+    PRIMARY KEY ({key})
+);"""
+
+# A row cannot be upserted twice in one statement, so a key repeated
+# within a snapshot fails the whole load, as it does in ``sqlitestore``.
+UPSERT_SQL = """BEGIN;
+
+{create_table}
+
+CREATE TEMPORARY TABLE {staging} (LIKE {table}) ON COMMIT DROP;
+
+\\copy {staging} ({columns}) FROM pstdin WITH (FORMAT {format})
+
+INSERT INTO {table} ({columns})
+SELECT {columns}
+FROM {staging}
+ON CONFLICT ({key}) DO UPDATE SET
+{updates};
+
+COMMIT;
+"""
+
+
+class CopyTextDialect(utils.TSVDialect):
+    """
+    ``utils.TSVDialect`` without an escape character, so the ``\\N`` of a
+    null is written as is. Values that need escaping make the writer
+    raise ``csv.Error``.
+    """
+    escapechar = None
+
+
+def escape_text(v):
+    """
+    Escapes a value for ``COPY ... FORMAT text``.
+    """
+    if isinstance(v, string_types):
+        return v.replace('\\', '\\\\').replace('\t', '\\t').replace('\n', '\\n').replace('\r', '\\r')
+    return v
+
+
+def null_count(rows):
+    return list(map(type, itertools.chain.from_iterable(rows))).count(NONE_TYPE)
+
+
+def format_text(payload, fieldnames=utils.KEY_ORDER):
+    """
+    Renders a list of results in ``COPY ... FORMAT text``. Values are
+    formatted as they are in CSV, and nulls are written as ``\\N``.
+    """
+    rows = utils.row_tuples(payload, fieldnames)
+    nulls = {None: NULL}
+
+    # Fast path: replace nulls and format the batch without escaping. It
+    # holds if no value needed escaping, in which case the only
+    # backslashes in the text are the nulls.
+    try:
+        text = utils.delimited_text([tuple(map(nulls.get, row, row)) for row in rows], CopyTextDialect)
+    except csv.Error:
+        text = None
+
+    # Counted by type: comparing every value against None is slow on
+    # Python 2, where unicode comparisons try to coerce the other side.
+    if text is None or '\r' in text or text.count('\\') != null_count(rows):
+        text = utils.delimited_text(
+            [tuple(NULL if v is None else escape_text(v) for v in row) for row in rows],
+            CopyTextDialect
+        )
+    return text
+
+
+def text_bytes(v):
+    """
+    Encodes a value of a text column as UTF-8, formatted as in CSV.
+    """
+    if isinstance(v, float):
+        v = repr(v)
+    elif not isinstance(v, string_types):
+        v = str(v)
+    if isinstance(v, bytes):
+        return v
+    return v.encode('utf-8')
+
+
+def encode_text(v):
+    b = text_bytes(v)
+    return LENGTH.pack(len(b)) + b
+
+
+def encode_int(v):
+    return INT8.pack(8, v)
+
+
+def encode_float(v):
+    return FLOAT8.pack(8, v)
+
+
+def encode_bool(v):
+    return BOOL.pack(1, v)
+
+
+ENCODERS = {
+    'bigint': encode_int,
+    'double precision': encode_float,
+    'boolean': encode_bool,
+}
+
+
+def format_binary(payload, fieldnames=utils.KEY_ORDER):
+    """
+    Renders a list of results as tuples in ``COPY ... FORMAT binary``,
+    without the file header and trailer.
+
+    The batch is encoded a column at a time, and each distinct value in a
+    column is encoded once: AP repeats the same race, reporting unit and
+    candidate values on row after row. Values are told apart by equality,
+    which is safe because no column mixes booleans with numbers, or text
+    with numbers.
+    """
+    rows = utils.row_tuples(payload, fieldnames)
+    if not rows:
+        return b''
+
+    columns = [[struct.pack('>h', len(fieldnames))] * len(rows)]
+    for k, column in zip(fieldnames, zip(*rows)):
+        encode = ENCODERS.get(COLUMN_TYPES.get(k, 'text'), encode_text)
+        lookup = {}
+        for v in set(column):
+            lookup[v] = BINARY_NULL if v is None else encode(v)
+        columns.append(map(lookup.__getitem__, column))
+
+    return b''.join(map(b''.join, zip(*columns)))
+
+
+def write_text(payload, writefile, fieldnames=utils.KEY_ORDER, batch_size=utils.OUTPUT_BATCH_SIZE):
+    """
+    Writes results to ``writefile`` in ``COPY ... FORMAT text``.
+    """
+    chunks = (format_text(b, fieldnames) for b in utils.batches(payload, batch_size))
+    utils.write_chunks(chunks, writefile)
+
+
+def write_binary(payload, writefile, fieldnames=utils.KEY_ORDER, batch_size=utils.OUTPUT_BATCH_SIZE):
+    """
+    Writes results to the binary file ``writefile`` in
+    ``COPY ... FORMAT binary``.
+    """
+    def chunks():
+        yield BINARY_HEADER
+        for batch in utils.batches(payload, batch_size):
+            yield format_binary(batch, fieldnames)
+        yield BINARY_TRAILER
+
+    utils.write_chunks(chunks(), writefile)
+
+
+def output_text(payload, fieldnames=utils.KEY_ORDER):
+    """
+    Dumps to ``COPY ... FORMAT text`` on stdout.
+    """
+    write_text(payload, sys.stdout, fieldnames)
+
+
+def output_binary(payload, fieldnames=utils.KEY_ORDER):
+    """
+    Dumps to ``COPY ... FORMAT binary`` on stdout.
+    """
+    write_binary(payload, utils.binary_stdout(), fieldnames)
+
+
+def create_table_sql(table='results', fieldnames=utils.KEY_ORDER):
+    """
+    Returns a ``CREATE TABLE`` statement for results.
+    """
+    columns = ',\n'.join('    %s %s' % (k, COLUMN_TYPES.get(k, 'text')) for k in fieldnames)
+    return CREATE_TABLE_SQL.format(table=table, columns=columns, key=', '.join(utils.ROW_KEYS))
+
+
+def upsert_sql(table='results', binary=True, fieldnames=utils.KEY_ORDER):
+    """
+    Returns a psql script that creates ``table`` if needed, copies a
+    snapshot from psql's standard input into a staging table and upserts
+    it into ``table`` on ``utils.ROW_KEYS``. Use it as:
+
+        results -d results.json -o pgbinary | psql -f upsert.sql
+    """
+    return UPSERT_SQL.format(
+        create_table=create_table_sql(table, fieldnames),
+        table=table,
+        staging='%s_staging' % table,
+        columns=', '.join(fieldnames),
+        format='binary' if binary else 'text',
+        key=', '.join(utils.ROW_KEYS),
+        updates=',\n'.join('    %s = EXCLUDED.%s' % (k, k) for k in fieldnames if k not in utils.ROW_KEYS)
+    )
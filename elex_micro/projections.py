@@ -0,0 +1,270 @@
+"""
+Race, reporting unit and candidate records.
+
+The ``races``, ``reportingunits`` and ``candidates`` commands walk the
+races of an AP file once and emit one record per distinct race,
+reporting unit or candidate, without building the
+candidate-reportingunit-race rows of ``results``. Fields are transformed
+as they are for ``results``, so the records join back to its rows on
+``raceid``, ``reportingunitid`` and ``polid``/``polnum``.
+"""
+import argparse
+import collections
+
+import arrowfile
+import pgcopy
+import utils
+
+RACE_KEY_ORDER = (
+    'id',
+    'raceid',
+    'racetype',
+    'racetypeid',
+    'description',
+    'electiondate',
+    'initialization_data',
+    'is_ballot_measure',
+    'lastupdated',
+    'national',
+    'numrunoff',
+    'numwinners',
+    'officeid',
+    'officename',
+    'party',
+    'runoff',
+    'seatname',
+    'seatnum',
+    'statename',
+    'statepostal',
+    'test',
+    'uncontested'
+)
+
+REPORTING_UNIT_KEY_ORDER = (
+    'id',
+    'raceid',
+    'racetype',
+    'racetypeid',
+    'description',
+    'electiondate',
+    'fipscode',
+    'initialization_data',
+    'lastupdated',
+    'level',
+    'national',
+    'officeid',
+    'officename',
+    'precinctsreporting',
+    'precinctsreportingpct',
+    'precinctstotal',
+    'reportingunitid',
+    'reportingunitname',
+    'seatname',
+    'seatnum',
+    'statename',
+    'statepostal',
+    'test',
+    'uncontested',
+    'votecount'
+)
+
+CANDIDATE_KEY_ORDER = (
+    'id',
+    'raceid',
+    'candidateid',
+    'ballotorder',
+    'first',
+    'middle',
+    'last',
+    'suffix',
+    'abbrv',
+    'party',
+    'polid',
+    'polnum',
+    'incumbent'
+)
+
+
+def project(fields, fieldnames):
+    return dict((k, fields.get(k, None)) for k in fieldnames)
+
+
+def race_record(electiondate, r):
+    """
+    Returns the record of an AP JSON race. State-level fields come from
+    its first reporting unit.
+    """
+    fields, camelcased = utils.lowercase_fields(r, ('reportingUnits',))
+    ru_fields, camelcased = utils.lowercase_fields(r['reportingUnits'][0], ('candidates', 'votecount'))
+    ru_fields.update(fields)
+    fields = utils.transform_reportingunit(ru_fields, electiondate)
+
+    record = project(fields, RACE_KEY_ORDER)
+    record['id'] = '%s-%s' % (record['statepostal'], record['raceid'])
+    return record
+
+
+def iter_races(electiondate, races):
+    """
+    Given an iterable of AP JSON races, yields a record per race.
+    """
+    seen = set()
+    for r in races:
+        if r.get('reportingUnits', None):
+            record = race_record(electiondate, r)
+            if record['id'] not in seen:
+                seen.add(record['id'])
+                yield record
+
+
+def candidate_votecount(c):
+    return c.get('voteCount', c.get('votecount', 0)) or 0
+
+
+def shadows(camelcased, c):
+    """
+    Returns True if a candidate carries lowercased fields that override
+    its reporting unit's, as the New England county rollups do.
+    """
+    return any(k in camelcased for k in c if k == k.lower())
+
+
+def reportingunit_records(electiondate, ru, ru_fields, camelcased, template):
+    """
+    Returns the records of a reporting unit. It is usually one, but the
+    candidates of a New England county rollup carry their own
+    ``reportingunitid``, and ``results`` groups their rows by it.
+    """
+    if not any(shadows(camelcased, c) for c in ru['candidates']):
+        record = project(template, REPORTING_UNIT_KEY_ORDER)
+        record['votecount'] = sum(candidate_votecount(c) for c in ru['candidates'])
+        return [record]
+
+    records = collections.OrderedDict()
+    for c in ru['candidates']:
+        fields = utils.candidate_fields(electiondate, ru_fields, camelcased, template, c)
+        record = records.get(fields['reportingunitid'], None)
+        if record is None:
+            record = records[fields['reportingunitid']] = project(fields, REPORTING_UNIT_KEY_ORDER)
+            record['votecount'] = 0
+        record['votecount'] += candidate_votecount(c)
+    return list(records.values())
+
+
+def iter_reportingunits(electiondate, races):
+    """
+    Given an iterable of AP JSON races, yields a record per reporting
+    unit, New England county rollups included, with the unit's total
+    ``votecount``.
+    """
+    seen = set()
+    for r in races:
+        if r.get('reportingUnits', None):
+            for fields in utils.iter_reportingunit_fields(electiondate, r):
+                for record in reportingunit_records(electiondate, *fields):
+                    record['id'] = '%s-%s' % (record['raceid'], record['reportingunitid'])
+                    if record['id'] not in seen:
+                        seen.add(record['id'])
+                        yield record
+
+
+def candidate_key(c):
+    # New England county rollups hold candidates whose keys are
+    # already lowercased. AP reuses polid '0' for candidates without
+    # one, so those are told apart by polnum.
+    polid = c.get('polID', c.get('polid', None))
+    if polid and polid != '0':
+        return 'polid-%s' % polid
+    return 'polnum-%s' % c.get('polNum', c.get('polnum', None))
+
+
+def iter_candidates(electiondate, races):
+    """
+    Given an iterable of AP JSON races, yields a record per candidate in
+    each race. Candidates are told apart before their fields are
+    transformed, so a candidate repeated in every reporting unit is only
+    transformed once.
+    """
+    seen = set()
+    for r in races:
+        for ru in r.get('reportingUnits', None) or ():
+            for c in ru['candidates']:
+                record_id = '%s-%s' % (r['raceID'], candidate_key(c))
+                if record_id not in seen:
+                    seen.add(record_id)
+                    fields, camelcased = utils.lowercase_fields(c)
+                    record = project(fields, CANDIDATE_KEY_ORDER)
+                    record['id'] = record_id
+                    record['raceid'] = r['raceID']
+                    yield record
+
+
+PROJECTIONS = {
+    'races': (iter_races, RACE_KEY_ORDER),
+    'reportingunits': (iter_reportingunits, REPORTING_UNIT_KEY_ORDER),
+    'candidates': (iter_candidates, CANDIDATE_KEY_ORDER),
+}
+
+
+def output(payload, fieldnames, output_format):
+    if output_format == 'json':
+        utils.output_json(payload)
+    elif output_format == 'jsonl':
+        utils.output_jsonl(payload)
+    elif output_format == 'tsv':
+        utils.output_tsv(payload, fieldnames)
+    elif output_format == 'pgcopy':
+        pgcopy.output_text(payload, fieldnames)
+    elif output_format == 'pgbinary':
+        pgcopy.output_binary(payload, fieldnames)
+    elif output_format == 'parquet':
+        arrowfile.output_parquet(payload, fieldnames)
+    elif output_format == 'arrow':
+        arrowfile.output_arrow(payload, fieldnames)
+    else:
+        utils.output_csv(payload, fieldnames)
+
+
+def main(name):
+    """
+    Runs the ``races``, ``reportingunits`` or ``candidates`` command.
+    """
+    iter_records, fieldnames = PROJECTIONS[name]
+
+    parser = argparse.ArgumentParser(description='Return AP Election %s' % name)
+    parser.add_argument('-d', '--file', action='store')
+    parser.add_argument('--races', action='store')
+    parser.add_argument('--states', action='store')
+    parser.add_argument('--offices', action='store')
+    parser.add_argument('-o', '--output', action='store', help='json, jsonl, csv, tsv, pgcopy, pgbinary, parquet or arrow')
+    parser.add_argument('--json', action='store_true')
+    parser.add_argument('--csv', action='store_true')
+    parser.add_argument('--tsv', action='store_true')
+    parser.add_argument('--mmap', action='store_true', help='Memory-map the input file instead of reading it')
+
+    args = parser.parse_args()
+
+    if not args.file:
+        print("""Please specify a data file with -d '/path/to/json/file.json'""")
+        return
+
+    race_ids = None
+    if args.races:
+        race_ids = args.races.split(',')
+
+    states = None
+    if args.states:
+        states = args.states.upper().split(',')
+
+    offices = None
+    if args.offices:
+        offices = args.offices.split(',')
+
+    output_format = args.output
+    if args.json:
+        output_format = 'json'
+    elif args.tsv:
+        output_format = 'tsv'
+
+    electiondate, races = utils.open_file(args.file, race_ids, True, states, offices, args.mmap)
+    output(iter_records(electiondate, races), fieldnames, output_format)
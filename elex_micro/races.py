@@ -0,0 +1,10 @@
+#!/usr/bin/env python
+
+import projections
+
+
+def main():
+    projections.main('races')
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,10 @@
+#!/usr/bin/env python
+
+import projections
+
+
+def main():
+    projections.main('reportingunits')
+
+if __name__ == "__main__":
+    main()
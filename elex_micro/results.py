@@ -2,44 +2,209 @@
 
 import argparse
 
+import arrowfile
+import cache
+import instrument
+import parallel
+import pgcopy
+import sqlitestore
 import utils
+import watch
+
+
+def get_results(file_path, race_ids=None, result_cache=None, states=None, offices=None, use_mmap=False,
+                stats=None):
+    """
+    Returns a generator of results for an AP JSON file, going through
+    ``result_cache`` when one is given. If ``stats`` is given, each stage
+    is timed into it and the cache is not used.
+    """
+    if stats is not None:
+        return instrument.iter_results(stats, file_path, race_ids, states, offices, use_mmap)
+
+    if result_cache:
+        return cache.cached_results(result_cache, file_path, race_ids, states, offices, use_mmap)
+
+    # Races are parsed, and rows generated, a race at a time, so only
+    # the race being written is held in memory.
+    electiondate, races = utils.open_file(file_path, race_ids, True, states, offices, use_mmap)
+    return utils.iter_results(electiondate, races)
+
+
+def write_results(args, race_ids=None, states=None, offices=None, result_cache=None, stats=None):
+    """
+    Writes the results for ``args.file`` to stdout, or to the SQLite
+    database at ``args.sqlite``, as ``args`` asks. With ``stats``, the
+    results are produced in this process, timing each stage.
+    """
+    if args.sqlite:
+        payload = get_results(args.file, race_ids, result_cache, states, offices, args.mmap, stats)
+        if stats is not None:
+            payload = stats.written(payload)
+        sqlitestore.write_sqlite(payload, args.sqlite)
+        return
+
+    if args.since:
+        # Only output rows that changed since the previous snapshot.
+        old = get_results(args.since, race_ids, result_cache, states, offices, args.mmap, stats)
+        new = get_results(args.file, race_ids, result_cache, states, offices, args.mmap, stats)
+        payload = utils.diff_results(old, new)
+        if stats is not None:
+            payload = stats.written(payload)
+
+        if args.json or args.output == 'json':
+            utils.output_json(payload)
+        elif args.output == 'jsonl':
+            utils.output_jsonl(payload)
+        elif args.tsv or args.output == 'tsv':
+            utils.output_tsv(payload, fieldnames=utils.DELTA_KEY_ORDER)
+        else:
+            utils.output_csv(payload, fieldnames=utils.DELTA_KEY_ORDER)
+        return
+
+    if args.workers > 1 and not result_cache and stats is None and args.output not in ('parquet', 'arrow'):
+        if args.json or args.output == 'json':
+            parallel.output_json(args.file, args.workers, race_ids, states, offices, args.mmap)
+        elif args.output == 'jsonl':
+            parallel.output_jsonl(args.file, args.workers, race_ids, states, offices, args.mmap)
+        elif args.tsv or args.output == 'tsv':
+            parallel.output_tsv(args.file, args.workers, race_ids, states, offices, args.mmap)
+        elif args.output == 'pgcopy':
+            parallel.output_pgcopy(args.file, args.workers, race_ids, states, offices, args.mmap)
+        elif args.output == 'pgbinary':
+            parallel.output_pgbinary(args.file, args.workers, race_ids, states, offices, args.mmap)
+        else:
+            parallel.output_csv(args.file, args.workers, race_ids, states, offices, args.mmap)
+        return
+
+    payload = get_results(args.file, race_ids, result_cache, states, offices, args.mmap, stats)
+    if stats is not None:
+        payload = stats.written(payload)
+
+    if args.json:
+        utils.output_json(payload)
+
+    elif args.output and args.output == 'json':
+        utils.output_json(payload)
+
+    elif args.output and args.output == 'jsonl':
+        utils.output_jsonl(payload)
+
+    elif args.tsv or args.output == 'tsv':
+        utils.output_tsv(payload)
+
+    elif args.output == 'pgcopy':
+        pgcopy.output_text(payload)
+
+    elif args.output == 'pgbinary':
+        pgcopy.output_binary(payload)
+
+    elif args.output == 'parquet':
+        arrowfile.output_parquet(payload)
+
+    elif args.output == 'arrow':
+        arrowfile.output_arrow(payload)
+
+    else:
+        utils.output_csv(payload)
 
 
 def main():
     parser = argparse.ArgumentParser(description='Return AP Election data')
     parser.add_argument('-d', '--file', action='store')
     parser.add_argument('--races', action='store')
-    parser.add_argument('-o', '--output', action='store')
+    parser.add_argument('--states', action='store')
+    parser.add_argument('--offices', action='store')
+    parser.add_argument('-o', '--output', action='store', help='json, jsonl, csv, tsv, pgcopy, pgbinary, parquet or arrow')
     parser.add_argument('--json', action='store_true')
     parser.add_argument('--csv', action='store_true')
     parser.add_argument('--tsv', action='store_true')
+    parser.add_argument('--workers', action='store', type=int, default=1)
+    parser.add_argument('--mmap', action='store_true', help='Memory-map the input file instead of reading it')
+    parser.add_argument('--since', action='store', metavar='PATH',
+                        help='Only output rows that changed since the snapshot at PATH, as json, jsonl, csv or tsv')
+    parser.add_argument('--cache', action='store', nargs='?', const=cache.DEFAULT_DIRECTORY)
+    parser.add_argument('--sqlite', action='store', metavar='PATH',
+                        help='Upsert results into the SQLite database at PATH instead of printing them')
+    parser.add_argument('--upsert-sql', action='store', metavar='TABLE',
+                        help='Print a psql script that upserts -o pgbinary or pgcopy output into TABLE')
+    parser.add_argument('--cache-size', action='store', type=int, default=cache.DEFAULT_MAX_BYTES // (1024 * 1024),
+                        help='Maximum size of the cache directory in MB')
+    parser.add_argument('--outfile', action='store', metavar='PATH',
+                        help='Write output to PATH, replacing it atomically, instead of to stdout')
+    parser.add_argument('--watch', action='store', metavar='PATH',
+                        help='Keep running, and process PATH again each time its contents change. Replace PATH '
+                             'atomically, by writing elsewhere and renaming, rather than rewriting it in place')
+    parser.add_argument('--interval', action='store', type=float, default=watch.DEFAULT_INTERVAL,
+                        help='Seconds between checks of the --watch file')
+    parser.add_argument('--stats', '--profile', action='store', nargs='?', const='-', metavar='PATH',
+                        help='Append the time, count and peak RSS of each pipeline stage as a line of JSON to '
+                             'PATH, or stderr. Runs in one process and skips the cache')
 
     args = parser.parse_args()
 
-    if args.file:
+    if args.since:
+        if args.output not in (None, 'json', 'jsonl', 'csv', 'tsv'):
+            parser.error('--since can only output json, jsonl, csv or tsv')
+        if args.sqlite:
+            parser.error('--since cannot be used with --sqlite')
+        if args.workers > 1:
+            parser.error('--since cannot be used with --workers')
+
+    if args.watch:
+        if args.mmap:
+            parser.error('--watch cannot be used with --mmap')
+        args.file = args.watch
+
+    if args.upsert_sql:
+        print(pgcopy.upsert_sql(args.upsert_sql, binary=args.output != 'pgcopy'))
+
+    elif args.file:
 
         race_ids = None
         if args.races:
             race_ids = args.races.split(',')
 
-        electiondate, races = utils.open_file(args.file, race_ids)
-        payload = utils.load_results(electiondate, races)
+        states = None
+        if args.states:
+            states = args.states.upper().split(',')
 
-        if args.json:
-            utils.output_json(payload)
+        offices = None
+        if args.offices:
+            offices = args.offices.split(',')
 
-        elif args.output and args.output == 'json':
-            utils.output_json(payload)
+        result_cache = None
+        if args.cache:
+            result_cache = cache.ResultCache(args.cache, args.cache_size * 1024 * 1024)
+
+        def process():
+            stats = instrument.Stats() if args.stats else None
+
+            def write():
+                if args.outfile and not args.sqlite:
+                    watch.write_atomic(args.outfile,
+                                       lambda: write_results(args, race_ids, states, offices, result_cache, stats))
+                else:
+                    write_results(args, race_ids, states, offices, result_cache, stats)
 
-        elif args.output and args.output == 'tsv':
-            utils.output_tsv(payload)
+            if stats is None:
+                write()
+            else:
+                stats.run(write)
+                stats.write(args.stats)
 
+        if args.watch:
+            watcher = watch.Watcher(
+                args.watch,
+                process,
+                lambda file_path: cache.snapshot_key(file_path, race_ids, states, offices)
+            )
+            watcher.run(args.interval)
         else:
-            utils.output_csv(payload)
+            process()
 
     else:
-        print """Please specify a data file with -d '/path/to/json/file.json'"""
+        print("""Please specify a data file with -d '/path/to/json/file.json'""")
 
 if __name__ == "__main__":
-    # cProfile.run('main()')
     main()
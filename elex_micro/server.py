@@ -0,0 +1,323 @@
+#!/usr/bin/env python
+"""
+Local HTTP results server.
+
+``results-server`` loads a snapshot with ``open_file``/``load_results``
+into a ``ResultSet`` indexed by ``raceid``, ``statepostal``, ``level``
+and ``reportingunitid``, and serves filtered results over HTTP:
+
+    GET /results?raceid=7002,7003&level=state
+    GET /results.csv?statepostal=CT
+    GET /status
+
+The snapshot file is polled as it is for ``results --watch``. A changed
+snapshot is loaded in a worker thread and swapped in once it is ready, so
+requests keep being served from the previous one in the meantime.
+Responses are also rendered in worker threads.
+
+Requires asyncio, so Python 3. The server is written with protocol
+callbacks rather than coroutines, so the module still compiles on
+Python 2.
+"""
+import argparse
+import json
+import sys
+import time
+
+try:
+    import asyncio
+except ImportError:
+    asyncio = None
+
+try:
+    from urllib.parse import parse_qs, urlsplit
+except ImportError:
+    from urlparse import parse_qs, urlsplit
+
+try:
+    from cStringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+import cache
+import utils
+import watch
+
+INDEX_KEYS = (
+    'raceid',
+    'statepostal',
+    'level',
+    'reportingunitid'
+)
+
+FORMATS = {
+    'json': ('application/json', utils.write_json),
+    'jsonl': ('application/x-ndjson', utils.write_jsonl),
+    'csv': ('text/csv; charset=utf-8', utils.write_csv),
+    'tsv': ('text/tab-separated-values; charset=utf-8', utils.write_tsv),
+}
+
+REASONS = {
+    200: 'OK',
+    400: 'Bad Request',
+    404: 'Not Found',
+    405: 'Method Not Allowed',
+    500: 'Internal Server Error',
+    503: 'Service Unavailable',
+}
+
+# Largest request head read before giving up on a client.
+MAX_REQUEST_BYTES = 64 * 1024
+
+
+class ResultSet(object):
+    """
+    A snapshot of results with an index per ``INDEX_KEYS`` column from
+    each value to the positions of its rows. It is never modified once
+    built, so it can be read from any thread while its replacement loads.
+    """
+
+    def __init__(self, payload):
+        self.payload = payload
+        self.loaded = time.time()
+        self.indexes = dict((k, {}) for k in INDEX_KEYS)
+        for i, p in enumerate(payload):
+            for k in INDEX_KEYS:
+                self.indexes[k].setdefault(p[k], []).append(i)
+
+    def __len__(self):
+        return len(self.payload)
+
+    def select(self, filters):
+        """
+        Returns the rows matching every filter, in snapshot order.
+        ``filters`` maps index keys to lists of accepted values.
+        """
+        positions = None
+        for k, values in sorted(filters.items(), key=lambda item: self.count(*item)):
+            matches = set()
+            for v in values:
+                matches.update(self.indexes[k].get(v, ()))
+            positions = matches if positions is None else positions & matches
+            if not positions:
+                return []
+
+        if positions is None:
+            return self.payload
+        return [self.payload[i] for i in sorted(positions)]
+
+    def count(self, k, values):
+        return sum(len(self.indexes[k].get(v, ())) for v in values)
+
+
+def load(file_path):
+    """
+    Loads an AP file into a ``ResultSet``.
+    """
+    electiondate, races = utils.open_file(file_path, stream=True)
+    return ResultSet(utils.load_results(electiondate, races))
+
+
+def render(results, output, filters):
+    content_type, write = FORMATS[output]
+    writefile = StringIO()
+    write(results.select(filters), writefile)
+    body = writefile.getvalue()
+    if not isinstance(body, bytes):
+        body = body.encode('utf-8')
+    return content_type, body
+
+
+def parse_query(query):
+    """
+    Returns the index filters in a query string. Each parameter may be
+    repeated or hold a comma-separated list. Raises ``ValueError`` for
+    a parameter that is not an index key.
+    """
+    filters = {}
+    for k, values in parse_qs(query).items():
+        if k not in INDEX_KEYS:
+            raise ValueError('Unknown filter %r' % k)
+        filters[k] = [v for value in values for v in value.split(',')]
+    return filters
+
+
+class ResultsServer(object):
+    """
+    Serves the results of ``file_path``, reloading it when it changes.
+    """
+
+    def __init__(self, file_path, loop, interval=watch.DEFAULT_INTERVAL, log=sys.stderr):
+        self.file_path = file_path
+        self.loop = loop
+        self.interval = interval
+        self.log = log
+        self.results = None
+        self.server = None
+        self.watcher = watch.Watcher(file_path, self.reload, cache.snapshot_key, log)
+        self.polling = None
+
+    def reload(self):
+        # Runs in a worker thread. Replacing the attribute is atomic, so
+        # requests see either the old snapshot or the new one.
+        self.results = load(self.file_path)
+
+    def poll(self):
+        """
+        Checks the snapshot in a worker thread, unless a check is already
+        running, and schedules the next check.
+        """
+        if self.polling is None or self.polling.done():
+            self.polling = self.loop.run_in_executor(None, self.watcher.poll)
+            self.polling.add_done_callback(self.polled)
+        self.loop.call_later(self.interval, self.poll)
+
+    def polled(self, future):
+        if future.exception() is not None:
+            self.log.write('%s: %s\n' % (self.file_path, future.exception()))
+        elif future.result():
+            self.log.write('%s: loaded %s\n' % (self.file_path, self.watcher.last_key))
+
+    def start(self, host='127.0.0.1', port=8000):
+        """
+        Loads the snapshot, starts listening and returns the bound port.
+        """
+        self.watcher.poll()
+        self.server = self.loop.run_until_complete(
+            self.loop.create_server(lambda: HTTPProtocol(self), host, port)
+        )
+        self.loop.call_later(self.interval, self.poll)
+        return self.server.sockets[0].getsockname()[1]
+
+    def stop(self):
+        if self.server is not None:
+            self.server.close()
+
+    def status(self):
+        results = self.results
+        return {
+            'file': self.file_path,
+            'key': self.watcher.last_key,
+            'rows': len(results) if results is not None else 0,
+            'loaded': results.loaded if results is not None else None,
+        }
+
+    def respond(self, path, query, callback):
+        """
+        Works out the response to a GET request and passes its status,
+        content type and body to ``callback``.
+        """
+        if path == '/status':
+            callback(200, 'application/json', json.dumps(self.status()).encode('utf-8'))
+            return
+
+        output = None
+        if path == '/results':
+            output = 'json'
+        elif path.startswith('/results.'):
+            output = path[len('/results.'):]
+        if output not in FORMATS:
+            callback(404, 'text/plain', b'Not found\n')
+            return
+
+        try:
+            filters = parse_query(query)
+        except ValueError as e:
+            callback(400, 'text/plain', ('%s\n' % e).encode('utf-8'))
+            return
+
+        results = self.results
+        if results is None:
+            callback(503, 'text/plain', b'No snapshot loaded\n')
+            return
+
+        def rendered(future):
+            if future.exception() is not None:
+                callback(500, 'text/plain', ('%s\n' % future.exception()).encode('utf-8'))
+            else:
+                callback(200, *future.result())
+
+        future = self.loop.run_in_executor(None, render, results, output, filters)
+        future.add_done_callback(rendered)
+
+
+if asyncio is not None:
+
+    class HTTPProtocol(asyncio.Protocol):
+        """
+        A minimal HTTP/1.1 connection: one GET request, one response.
+        Anything received after the request head is ignored.
+        """
+
+        def __init__(self, server):
+            self.server = server
+            self.transport = None
+            self.buf = b''
+            self.handled = False
+
+        def connection_made(self, transport):
+            self.transport = transport
+
+        def data_received(self, data):
+            if self.handled:
+                return
+            self.buf += data
+            if b'\r\n\r\n' not in self.buf:
+                if len(self.buf) > MAX_REQUEST_BYTES:
+                    self.handled = True
+                    self.send(400, 'text/plain', b'Request too large\n')
+                return
+
+            self.handled = True
+            request_line = self.buf.split(b'\r\n', 1)[0].decode('latin-1')
+            parts = request_line.split()
+            if len(parts) != 3:
+                self.send(400, 'text/plain', b'Bad request\n')
+            elif parts[0] != 'GET':
+                self.send(405, 'text/plain', b'Only GET is supported\n')
+            else:
+                url = urlsplit(parts[1])
+                self.server.respond(url.path, url.query, self.send)
+
+        def send(self, status, content_type, body):
+            if self.transport.is_closing():
+                return
+            head = (
+                'HTTP/1.1 %d %s\r\n'
+                'Content-Type: %s\r\n'
+                'Content-Length: %d\r\n'
+                'Connection: close\r\n'
+                '\r\n'
+            ) % (status, REASONS[status], content_type, len(body))
+            self.transport.write(head.encode('latin-1') + body)
+            self.transport.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve AP Election results over HTTP')
+    parser.add_argument('-d', '--file', action='store', required=True)
+    parser.add_argument('--host', action='store', default='127.0.0.1')
+    parser.add_argument('--port', action='store', type=int, default=8000)
+    parser.add_argument('--interval', action='store', type=float, default=watch.DEFAULT_INTERVAL,
+                        help='Seconds between checks of the file for a new snapshot')
+    args = parser.parse_args()
+
+    if asyncio is None:
+        parser.error('results-server requires Python 3')
+
+    loop = asyncio.new_event_loop()
+    server = ResultsServer(args.file, loop, args.interval)
+    port = server.start(args.host, args.port)
+    sys.stderr.write('Serving %s on http://%s:%d/\n' % (args.file, args.host, port))
+
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+        loop.close()
+
+
+if __name__ == '__main__':
+    main()
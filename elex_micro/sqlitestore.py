@@ -0,0 +1,127 @@
+"""
+SQLite snapshot store.
+
+``write_sqlite`` loads results into a ``results`` table keyed on
+``utils.ROW_KEYS``, so a database reused across polls always holds the
+latest value of every row. Each load runs in a single transaction that
+inserts rows a batch at a time into a staging table and then upserts
+them into ``results``. Indexes on the columns desks filter by are built
+once the rows are in. The database is in WAL mode, so it can be queried
+while a poll loads.
+"""
+import sqlite3
+
+import utils
+
+TABLE = 'results'
+
+# SQLite type of each column. ``winner`` is left untyped, so True and
+# AP's raw flags are both stored as they are.
+COLUMN_TYPES = dict(
+    [(k, 'INTEGER') for k in utils.INT_KEYS + utils.BOOL_KEYS] +
+    [(k, 'REAL') for k in utils.FLOAT_KEYS] +
+    [('winner', '')]
+)
+
+INDEX_KEYS = (
+    'raceid',
+    'reportingunitid',
+    'level',
+    'statepostal'
+)
+
+# Rows per executemany call.
+BATCH_SIZE = 10000
+
+
+def create_table_sql(table=TABLE, fieldnames=utils.KEY_ORDER, temporary=False):
+    columns = ',\n'.join(
+        ('    %s %s' % (k, COLUMN_TYPES.get(k, 'TEXT'))).rstrip()
+        for k in fieldnames
+    )
+    return 'CREATE %sTABLE IF NOT EXISTS %s (\n%s,\n    PRIMARY KEY (%s)\n)' % (
+        'TEMPORARY ' if temporary else '',
+        table,
+        columns,
+        ', '.join(utils.ROW_KEYS)
+    )
+
+
+def create_index_sql(table=TABLE, keys=INDEX_KEYS):
+    return [
+        'CREATE INDEX IF NOT EXISTS %s_%s ON %s (%s)' % (table, k, table, k)
+        for k in keys
+    ]
+
+
+def insert_sql(table, fieldnames=utils.KEY_ORDER):
+    # A plain INSERT, so a key repeated within a snapshot fails the load
+    # instead of silently replacing a row.
+    return 'INSERT INTO %s (%s) VALUES (%s)' % (
+        table,
+        ', '.join(fieldnames),
+        ', '.join('?' * len(fieldnames))
+    )
+
+
+def upsert_sql(table, staging, fieldnames=utils.KEY_ORDER):
+    columns = ', '.join(fieldnames)
+    return 'INSERT OR REPLACE INTO %s (%s) SELECT %s FROM %s' % (table, columns, columns, staging)
+
+
+def primary_key(connection, table):
+    """
+    Returns the primary key columns of ``table``, in key order.
+    """
+    columns = connection.execute('PRAGMA table_info(%s)' % table).fetchall()
+    # Each row is (cid, name, type, notnull, default, pk), where pk is the
+    # column's 1-based position in the key, or 0.
+    return tuple(c[1] for c in sorted(columns, key=lambda c: c[5]) if c[5])
+
+
+def connect(path):
+    # Transactions are managed explicitly, so the module does not commit
+    # behind our back before CREATE statements.
+    connection = sqlite3.connect(path, isolation_level=None)
+    connection.execute('PRAGMA journal_mode = WAL')
+    connection.execute('PRAGMA synchronous = NORMAL')
+    return connection
+
+
+def write_sqlite(payload, path, table=TABLE, batch_size=BATCH_SIZE):
+    """
+    Upserts results into ``table`` of the SQLite database at ``path``,
+    creating the table and its indexes if needed. Returns the number of
+    rows written.
+
+    Raises ``sqlite3.IntegrityError`` if two rows share a key, and
+    ``ValueError`` if ``table`` is keyed on other columns.
+    """
+    staging = '%s_staging' % table
+    connection = connect(path)
+    count = 0
+
+    # If anything fails, closing the connection rolls the transaction back
+    # and the previous poll is left as it was.
+    try:
+        connection.execute('BEGIN')
+        connection.execute(create_table_sql(table))
+        if primary_key(connection, table) != utils.ROW_KEYS:
+            raise ValueError('%s is not keyed on %s; load into a new database' % (table, ', '.join(utils.ROW_KEYS)))
+
+        connection.execute(create_table_sql(staging, temporary=True))
+
+        sql = insert_sql(staging)
+        for batch in utils.batches(payload, batch_size):
+            connection.executemany(sql, utils.row_tuples(batch))
+            count += len(batch)
+
+        connection.execute(upsert_sql(table, staging))
+
+        for sql in create_index_sql(table):
+            connection.execute(sql)
+        connection.execute('COMMIT')
+
+    finally:
+        connection.close()
+    return count
@@ -1,8 +1,19 @@
 import csv
+import itertools
+import operator
+import re
 import sys
 
+try:
+    from cStringIO import StringIO
+except ImportError:
+    from io import StringIO
+
 import ujson
 
+import compressed
+import jsonstream
+import kernels
 import maps
 
 KEY_ORDER = (
@@ -54,42 +65,289 @@ KEY_ORDER = (
     'winner'
 )
 
+# Fields that hold whole numbers, fractions and booleans when they are not
+# null. Every other field holds text, except ``winner``, which is True for
+# a called race and otherwise AP's raw winner flag.
+INT_KEYS = (
+    'ballotorder',
+    'delegatecount',
+    'electtotal',
+    'electwon',
+    'numrunoff',
+    'numwinners',
+    'precinctsreporting',
+    'precinctstotal',
+    'totalvotes',
+    'votecount'
+)
+
+FLOAT_KEYS = (
+    'precinctsreportingpct',
+    'votepct'
+)
+
+BOOL_KEYS = (
+    'incumbent',
+    'initialization_data',
+    'is_ballot_measure',
+    'national',
+    'runoff',
+    'test',
+    'uncontested'
+)
+
+# Fields that identify a row in a snapshot, used as the key of the SQL
+# stores. ``id`` cannot be: AP reuses polids such as '0' within a race,
+# so several candidates of a reporting unit can share an ``id``.
+ROW_KEYS = (
+    'raceid',
+    'level',
+    'reportingunitid',
+    'polnum'
+)
+
+# Fields compared between snapshots by ``diff_results``.
+DELTA_KEYS = (
+    'votecount',
+    'precinctsreporting',
+    'winner'
+)
+
+# Delta output adds a column saying whether each row was added, changed
+# or deleted since the previous snapshot.
+DELTA_KEY_ORDER = KEY_ORDER + ('delta',)
+
+# Rows formatted per write by the output writers.
+OUTPUT_BATCH_SIZE = 1000
+
+
+def batches(payload, batch_size=OUTPUT_BATCH_SIZE):
+    """
+    Yields lists of up to ``batch_size`` rows from ``payload`` as it is
+    consumed.
+    """
+    payload = iter(payload)
+    while True:
+        batch = list(itertools.islice(payload, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+def binary_stdout():
+    """
+    Returns stdout for writing bytes.
+    """
+    return getattr(sys.stdout, 'buffer', sys.stdout)
+
+
+def write_chunks(chunks, writefile):
+    """
+    Writes each chunk of output text in one call, flushing as it goes so
+    readers downstream see each batch as soon as it is formatted.
+    """
+    for chunk in chunks:
+        writefile.write(chunk)
+        writefile.flush()
+
+
+def format_json(payload):
+    """
+    Renders results as comma-separated JSON objects, without the
+    enclosing array.
+    """
+    return ','.join(map(ujson.dumps, payload))
+
+
+def format_jsonl(payload):
+    """
+    Renders results as JSON Lines: one object per line.
+    """
+    return ''.join(ujson.dumps(p) + '\n' for p in payload)
+
+
+def write_json(payload, writefile, batch_size=OUTPUT_BATCH_SIZE):
+    """
+    Writes results to ``writefile`` as a JSON array, serializing and
+    writing ``batch_size`` rows at a time.
+    """
+    def chunks():
+        yield '['
+        for i, batch in enumerate(batches(payload, batch_size)):
+            if i:
+                yield ',' + format_json(batch)
+            else:
+                yield format_json(batch)
+        yield ']'
+
+    write_chunks(chunks(), writefile)
+
+
+def write_jsonl(payload, writefile, batch_size=OUTPUT_BATCH_SIZE):
+    """
+    Writes results to ``writefile`` as JSON Lines, serializing and writing
+    ``batch_size`` rows at a time.
+    """
+    write_chunks((format_jsonl(b) for b in batches(payload, batch_size)), writefile)
+
 
 def output_json(payload):
     """
-    Generically dumps to JSON.
+    Generically dumps to JSON on stdout. Rows are serialized a batch at a
+    time so ``payload`` can be a generator.
     """
-    sys.stdout.write(ujson.dumps(payload))
+    write_json(payload, sys.stdout)
 
 
-def output_csv(payload):
+def output_jsonl(payload):
     """
-    Generically dumps to a CSV on stdout.
+    Dumps to JSON Lines on stdout.
     """
-    writer = csv.DictWriter(sys.stdout, fieldnames=KEY_ORDER)
-    writer.writeheader()
+    write_jsonl(payload, sys.stdout)
 
-    for p in payload:
-        writer.writerow(p)
 
+class TSVDialect(csv.Dialect):
+    """
+    Tab-separated values as read by Postgres ``COPY ... FORMAT text``: no
+    quoting, and special characters escaped with a backslash.
+    """
+    delimiter = '\t'
+    quotechar = None
+    quoting = csv.QUOTE_NONE
+    escapechar = '\\'
+    doublequote = False
+    skipinitialspace = False
+    lineterminator = '\n'
+
+
+# ``csv`` escapes a tab, newline or backslash in a value by putting a
+# backslash in front of it, and leaves carriage returns alone. COPY wants
+# the two-character escapes instead.
+TSV_ESCAPE_RE = re.compile(r'\\(.)|\r', re.DOTALL)
+TSV_ESCAPES = {
+    '\t': '\\t',
+    '\n': '\\n',
+    '\\': '\\\\',
+    None: '\\r',
+}
+
+
+def row_tuples(payload, fieldnames=KEY_ORDER):
+    """
+    Returns results as tuples of their values in ``fieldnames`` order.
+    Missing fields are left blank and extra fields are ignored.
+    """
+    try:
+        return list(map(operator.itemgetter(*fieldnames), payload))
+    except KeyError:
+        return [tuple(p.get(k, '') for k in fieldnames) for p in payload]
+
+
+def delimited_text(rows, dialect='excel'):
+    """
+    Formats tuples of values with a plain ``csv.writer``.
+    """
+    out = StringIO()
+    csv.writer(out, dialect).writerows(rows)
+    return out.getvalue()
+
+
+def format_csv(payload, fieldnames=KEY_ORDER):
+    """
+    Renders a list of results as CSV text, without a header. Values are
+    pulled out as tuples in ``fieldnames`` order and formatted by a plain
+    ``csv.writer``, so the text is the same as ``csv.DictWriter`` would
+    write, without its per-row checks.
+    """
+    return delimited_text(row_tuples(payload, fieldnames))
 
-def output_tsv(payload):
-    sys.stdout.write("\t".join(payload[0].keys()))
-    for p in payload:
-        sys.stdout.write("\t".join(p.values()))
+
+def format_tsv(payload, fieldnames=KEY_ORDER):
+    """
+    Renders a list of results as TSV text, without a header. Values are
+    formatted as they are in CSV, and tabs, newlines, carriage returns and
+    backslashes in them are escaped as ``\\t``, ``\\n``, ``\\r`` and ``\\\\``.
+    """
+    text = delimited_text(row_tuples(payload, fieldnames), TSVDialect)
+    if '\\' in text or '\r' in text:
+        text = TSV_ESCAPE_RE.sub(lambda m: TSV_ESCAPES[m.group(1)], text)
+    return text
 
 
-def open_file(file_path, race_ids=None):
+def write_delimited(payload, writefile, fieldnames, batch_size, dialect, formatter):
+    """
+    Writes a header and then results to ``writefile``, formatting
+    ``batch_size`` rows at a time with ``formatter`` and writing each
+    batch in one call.
+    """
+    def chunks():
+        yield delimited_text([fieldnames], dialect)
+        for batch in batches(payload, batch_size):
+            yield formatter(batch, fieldnames)
+
+    write_chunks(chunks(), writefile)
+
+
+def write_csv(payload, writefile, fieldnames=KEY_ORDER, batch_size=OUTPUT_BATCH_SIZE):
+    """
+    Writes results as CSV to ``writefile``.
+    """
+    write_delimited(payload, writefile, fieldnames, batch_size, 'excel', format_csv)
+
+
+def write_tsv(payload, writefile, fieldnames=KEY_ORDER, batch_size=OUTPUT_BATCH_SIZE):
+    """
+    Writes results as TSV to ``writefile``.
+    """
+    write_delimited(payload, writefile, fieldnames, batch_size, TSVDialect, format_tsv)
+
+
+def output_csv(payload, fieldnames=KEY_ORDER):
+    """
+    Generically dumps to a CSV on stdout.
+    """
+    write_csv(payload, sys.stdout, fieldnames)
+
+
+def output_tsv(payload, fieldnames=KEY_ORDER):
+    """
+    Dumps to a TSV on stdout.
+    """
+    write_tsv(payload, sys.stdout, fieldnames)
+
+
+def open_file(file_path, race_ids=None, stream=False, states=None, offices=None, use_mmap=False):
     """
     Opens and returns an AP JSON file.
+
+    Only races whose ``raceID``, state postal code and ``officeID`` are in
+    ``race_ids``, ``states`` and ``offices`` are returned, for each of them
+    that is given.
+
+    With ``stream=True`` the races are returned as an iterator that parses
+    the file one race at a time as it is consumed, instead of a list.
+    Races that are filtered out are skipped without being decoded.
+
+    With ``use_mmap=True`` the file is memory-mapped rather than read.
+    gzip and zstd files are decompressed as they are read.
     """
-    with open(file_path, 'r') as readfile:
-        parsed_json = ujson.loads(readfile.read())
-        electiondate = parsed_json['electionDate']
-        if race_ids:
-            return (electiondate, [r for r in parsed_json['races'] if r in race_ids])
-        else:
-            return (electiondate, parsed_json['races'])
+    race_filter = jsonstream.RaceFilter(race_ids, states, offices)
+
+    if stream:
+        races = jsonstream.open_races(file_path, race_filter=race_filter, use_mmap=use_mmap)
+        return (races.electiondate, iter(races))
+
+    if use_mmap:
+        parsed_json = jsonstream.load_mapped(file_path)
+    else:
+        with compressed.open_input(file_path) as readfile:
+            parsed_json = ujson.loads(readfile.read())
+
+    electiondate = parsed_json['electionDate']
+    if race_filter:
+        return (electiondate, [r for r in parsed_json['races'] if race_filter.match(r)])
+    else:
+        return (electiondate, parsed_json['races'])
 
 
 def lowercase_keys(c):
@@ -110,7 +368,7 @@ def set_statename(c):
 
 
 def set_county(c):
-    if c['statepostal'] in maps.FIPS_TO_STATE.keys():
+    if c['statepostal'] in maps.NEW_ENGLAND_STATES:
         if c['level'] == 'subunit':
             c['level'] = 'township'
     elif c['level'] == 'subunit':
@@ -129,7 +387,7 @@ def set_reportingunitname(c):
 
 def set_township(c):
     try:
-        if c['statepostal'] in maps.FIPS_TO_STATE.keys():
+        if c['statepostal'] in maps.NEW_ENGLAND_STATES:
             if c['level'] == 'subunit':
                 c['level'] = 'township'
     except KeyError:
@@ -200,187 +458,326 @@ def compute_pcts(payload, votecounts):
     return payload
 
 
+def group_subunits(r):
+    """
+    Groups a race's township reporting units by county fips code in a
+    single pass. Mail ballot units are not part of any county.
+    """
+    subunits = {}
+    for z in r['reportingUnits']:
+        if z['level'] == 'subunit' and "Mail Ballots C.D." not in z['reportingunitName']:
+            subunits.setdefault(z['fipsCode'], []).append(z)
+    return subunits
+
+
 def set_new_england_counties(r):
 
     state_postal = r['reportingUnits'][-1]['statePostal']
 
     # Only engage the rollups if this is a new england state.
     if state_postal:
-        if state_postal in maps.FIPS_TO_STATE.keys():
+        if state_postal in maps.NEW_ENGLAND_STATES:
 
             counties = {}
+            fips_dict = maps.FIPS_TO_STATE[state_postal]
+            subunits = group_subunits(r)
 
-            for c in maps.FIPS_TO_STATE[state_postal].keys():
-                try:
-                    counties[c] = dict([
-                        z for
-                        z in r['reportingUnits'] if
-                        z['level'] == 'subunit' and
-                        "Mail Ballots C.D." not in z['reportingunitName'] and
-                        z['fipsCode'] == c
-                    ][0])
-
-                    # Set some basic information we know about the county.
-                    counties[c]['level'] = 'county'
-                    counties[c]['statePostal'] = state_postal
-                    counties[c]['candidates'] = {}
-                    counties[c]['reportingunitName'] =\
-                        maps.FIPS_TO_STATE[state_postal][c]
-                    counties[c]['reportingunitID'] = "%s-%s" % (
-                        state_postal,
-                        c
-                    )
-
-                    reporting_units = [
-                        z for
-                        z in r['reportingUnits'] if
-                        z['level'] == 'subunit' and
-                        "Mail Ballots C.D." not in z['reportingunitName'] and
-                        z['fipsCode'] == c
-                    ]
-
-                    # Declaratively sum the precincts for this county.
-                    counties[c]['precinctsTotal'] = sum([
-                        z['precinctsTotal'] for
-                        z in reporting_units if
-                        z['level'] == 'subunit' and
-                        "Mail Ballots C.D." not in z['reportingunitName'] and
-                        z['fipsCode'] == c
-                    ])
-                    counties[c]['precinctsReporting'] = sum([
-                        z['precinctsReporting'] for
-                        z in reporting_units if
-                        z['level'] == 'subunit' and
-                        "Mail Ballots C.D." not in z['reportingunitName'] and
-                        z['fipsCode'] == c
-                    ])
-
-                    pcts_tot = float(counties[c]['precinctsTotal'])
-                    pcts_rep = float(counties[c]['precinctsReporting'])
-
-                    try:
-                        counties[c]['precinctsReportingPct'] = (pcts_rep / pcts_tot) * 100
-                    except ZeroDivisionError:
-                        counties[c]['precinctsReportingPct'] = 0.0
-
-                    for z in reporting_units:
-
-                        # Set up candidates for each county.
-                        for cru in z['candidates']:
-
-                            cru['raceid'] = r['raceID']
-                            cru['level'] = z['level']
-
-                            cru['reportingunitid'] = z['reportingunitID']
-
-                            cru = lowercase_keys(cru)
-                            cru = set_reportingunitid(cru)
-                            cru = set_uniqueid(cru)
-
-                            if not counties[c]['candidates'].get(cru['id'], None):
-                                d = dict(cru)
-                                d['level'] = 'county'
-                                fips_dict = maps.FIPS_TO_STATE[z['statePostal']]
-                                d['reportingunitName'] = fips_dict[c]
-                                counties[c]['candidates'][cru['id']] = d
-
-                            else:
-                                d = counties[c]['candidates'][cru['id']]
-                                d['votecount'] += cru['votecount']
-                                d['precinctsTotal'] += cru['precinctsTotal']
-                                d['precinctsreporting'] += cru['precinctsReporting']
-
-                                try:
-                                    d['precinctsReportingPct'] = (
-                                        float(d['precinctsReporting']) /
-                                        float(d['precinctsTotal'])
-                                    )
-
-                                except ZeroDivisionError:
-                                    d['precinctsReportingPct'] = 0.0
-
-                except IndexError:
+            for c in fips_dict:
+                reporting_units = subunits.get(c, None)
+
+                if not reporting_units:
                     """
                     This is the ME bug from the ME primary.
                     """
-                    pass
+                    continue
+
+                counties[c] = dict(reporting_units[0])
+
+                # Set some basic information we know about the county.
+                counties[c]['level'] = 'county'
+                counties[c]['statePostal'] = state_postal
+                counties[c]['candidates'] = {}
+                counties[c]['reportingunitName'] = maps.FIPS_TO_COUNTY[c]
+                counties[c]['reportingunitID'] = "%s-%s" % (
+                    state_postal,
+                    c
+                )
+
+                # Sum the precincts for this county.
+                pcts_tot = 0
+                pcts_rep = 0
+                for z in reporting_units:
+                    pcts_tot += z['precinctsTotal']
+                    pcts_rep += z['precinctsReporting']
+                counties[c]['precinctsTotal'] = pcts_tot
+                counties[c]['precinctsReporting'] = pcts_rep
 
-            try:
-                for ru in counties.values():
-                    ru['candidates'] = ru['candidates'].values()
-                    ru['statename'] = str(maps.STATE_ABBR[ru['statePostal']])
-                    r['reportingUnits'].append(ru)
-
-            except AttributeError:
-                """
-                Sometimes, the dict is empty because we have no townships to
-                roll up into counties. Issue #228.
-                """
-                pass
+                try:
+                    counties[c]['precinctsReportingPct'] = (float(pcts_rep) / float(pcts_tot)) * 100
+                except ZeroDivisionError:
+                    counties[c]['precinctsReportingPct'] = 0.0
+
+                county_candidates = counties[c]['candidates']
+
+                for z in reporting_units:
+
+                    # Set up candidates for each county.
+                    for cru in z['candidates']:
+
+                        cru = lowercase_keys(cru)
+                        cru['raceid'] = r['raceID']
+                        cru['level'] = z['level']
+                        cru['reportingunitid'] = z['reportingunitID']
+                        cru = set_reportingunitid(cru)
+                        cru = set_uniqueid(cru)
+
+                        if not county_candidates.get(cru['id'], None):
+                            d = cru
+                            d['level'] = 'county'
+                            d['reportingunitName'] = maps.FIPS_TO_COUNTY[c]
+                            county_candidates[cru['id']] = d
+
+                        else:
+                            d = county_candidates[cru['id']]
+                            d['votecount'] += cru['votecount']
+                            d['precinctsTotal'] += cru['precinctsTotal']
+                            d['precinctsreporting'] += cru['precinctsReporting']
+
+                            try:
+                                d['precinctsReportingPct'] = (
+                                    float(d['precinctsReporting']) /
+                                    float(d['precinctsTotal'])
+                                )
+
+                            except ZeroDivisionError:
+                                d['precinctsReportingPct'] = 0.0
+
+            for ru in counties.values():
+                ru['candidates'] = list(ru['candidates'].values())
+                ru['statename'] = maps.STATE_ABBR[ru['statePostal']]
+                r['reportingUnits'].append(ru)
 
     return r
 
 
-def load_results(electiondate, races):
+def lowercase_fields(d, exclude=()):
     """
-    Given a list of AP JSON races, returns candidate-reportingunit-race
-    objects, e.g., results.
+    Lowercases the keys of an AP object, leaving out the keys in
+    ``exclude``. Also returns the set of lowercased keys that arrived
+    camelCased, which candidate fields are allowed to override.
     """
+    fields = {}
+    camelcased = set()
+    for k, v in d.items():
+        if k not in exclude:
+            if k == 'precinctsReportingPct':
+                v = float(v) / 100
+            lk = k.lower()
+            if lk != k:
+                camelcased.add(lk)
+            fields[lk] = v
+    return fields, camelcased
+
+
+def transform_reportingunit(c, electiondate):
+    """
+    Runs the transforms that only depend on race and reporting unit
+    fields, so they can be applied once per reporting unit.
+    """
+    c = set_electiondate(c, electiondate)
+    c = set_county(c)
+    c = set_statename(c)
+    c = set_township(c)
+    c = pad_fips(c)
+    c = set_reportingunitid(c)
+    c = set_reportingunitname(c)
+    return c
+
+
+def merge_candidate(fields, camelcased, c):
+    """
+    Adds a candidate's fields to the race and reporting unit fields.
+    Race and reporting unit values win, except over already lowercased
+    candidate keys that shadow camelCased ones: those are set by
+    ``set_new_england_counties`` and are kept. Returns True if the
+    candidate overrode a shared field.
+    """
+    overridden = False
+    for k, v in c.items():
+        lk = k.lower()
+        if lk not in fields:
+            fields[lk] = v
+        elif lk == k and lk in camelcased:
+            fields[lk] = v
+            overridden = True
+    return overridden
+
+
+def iter_reportingunit_fields(electiondate, r, rollup=True):
+    """
+    Given a single AP JSON race, yields each of its reporting units, New
+    England county rollups included, with the untransformed race and
+    reporting unit fields, the set of those fields that arrived camelCased,
+    and the transformed fields shared by every candidate in the unit.
+
+    Pass ``rollup=False`` if ``set_new_england_counties`` has already been
+    applied to the race.
+    """
+
+    # Create fake county records for new england townships
+    # by rolling them up by fips code.
+    if rollup:
+        r = set_new_england_counties(r)
 
-    payload = []
-    votecounts = {}
+    # Race data is the same for every row in the race.
+    race_fields, race_camelcased = lowercase_fields(r, ('reportingUnits',))
 
+    for ru in r['reportingUnits']:
+
+        # Reporting unit data is the same for every candidate in the
+        # unit, so it is merged with the race data and transformed once.
+        ru_fields, camelcased = lowercase_fields(ru, ('candidates', 'votecount'))
+        ru_fields.update(race_fields)
+        camelcased |= race_camelcased
+        template = transform_reportingunit(dict(ru_fields), electiondate)
+
+        yield ru, ru_fields, camelcased, template
+
+
+def candidate_fields(electiondate, ru_fields, camelcased, template, c):
+    """
+    Returns a candidate's fields merged with the transformed fields of its
+    race and reporting unit.
+    """
+    cru = dict(template)
+    if merge_candidate(cru, camelcased, c):
+        # The candidate replaced a field the transforms depend
+        # on, so run them again from the untransformed fields.
+        cru = dict(ru_fields)
+        merge_candidate(cru, camelcased, c)
+        cru = transform_reportingunit(cru, electiondate)
+    return cru
+
+
+def build_race(electiondate, r, rollup=True):
+    """
+    Given a single AP JSON race, yields its candidate-reportingunit-race
+    objects before vote totals and pcts are computed.
+    """
+
+    # Create a default dictionary out of our KEY_ORDER
+    # tuple where the default value is None.
+    defaults = dict(((k, None) for k in KEY_ORDER))
+
+    for ru, ru_fields, camelcased, template in iter_reportingunit_fields(electiondate, r, rollup):
+        for c in ru['candidates']:
+
+            # Add the candidate data to the shared fields.
+            cru = candidate_fields(electiondate, ru_fields, camelcased, template, c)
+
+            # Transform the results.
+            cru = set_winner(cru)
+            cru = set_uniqueid(cru)
+
+            # Update the dict template we have with real data.
+            # This makes sure every key has at least the default values.
+            row = dict(defaults)
+            row.update(cru)
+
+            # The result is a single dict for each candidate-reportingunit-race.
+            yield row
+
+
+def load_race(electiondate, r):
+    """
+    Given a single AP JSON race, returns its candidate-reportingunit-race
+    objects annotated with vote totals and pcts.
+    """
+    return set_race_pcts(list(build_race(electiondate, r)))
+
+
+def set_race_pcts(payload):
+    """
+    Given the candidate-reportingunit-race objects of a single race,
+    annotates them with vote totals and pcts.
+    """
+
+    # Get vote totals for each reportingunit in one batch. The race is
+    # the same for every row, so the reportingunitid is the group key.
+    totals, pcts = kernels.group_pcts(
+        [c['votecount'] for c in payload],
+        [c['reportingunitid'] for c in payload]
+    )
+
+    # Annotate each reportingunit with vote totals and pcts.
+    for c, total, pct in zip(payload, totals, pcts):
+        c['totalvotes'] = total
+        if pct is not None:
+            c['votepct'] = pct
+
+    return payload
+
+
+def iter_results(electiondate, races):
+    """
+    Given an iterable of AP JSON races, yields candidate-reportingunit-race
+    objects as each race is transformed.
+
+    Vote totals are keyed on raceid and reportingunitid, and the New England
+    county rollups can repeat a reportingunitid across reporting units, so
+    a race is the smallest batch whose totals are final. Only that race's
+    rows are held in memory before they are yielded.
+    """
     for r in races:
         if r.get('reportingUnits', None):
+            for cru in load_race(electiondate, r):
+                yield cru
 
-            # Create data structure for aggregating votes.
-            if not votecounts.get(r['raceID'], None):
-                votecounts[r['raceID']] = {}
-
-            # Create fake county records for new england townships
-            # by rolling them up by fips code.
-            r = set_new_england_counties(r)
-
-            for ru in r['reportingUnits']:
-                for c in ru['candidates']:
-
-                    # Create a default dictionary out of our KEY_ORDER
-                    # tuple where the default value is None.
-                    cru = dict(((k, None) for k in KEY_ORDER))
-
-                    # Add reporting unit data to the candidate.
-                    for k, v in ru.items():
-                        if k not in ['candidates', 'votecount']:
-                            if k == 'precinctsReportingPct':
-                                v = float(v) / 100
-                            c[k] = v
-
-                    # Add race data to the candidate.
-                    for k, v in r.items():
-                        if k != 'reportingUnits':
-                            c[k] = v
-
-                    # Transform the results.
-                    c = lowercase_keys(c)
-                    c = set_electiondate(c, electiondate)
-                    c = set_winner(c)
-                    c = set_county(c)
-                    c = set_statename(c)
-                    c = set_township(c)
-                    c = pad_fips(c)
-                    c = set_reportingunitid(c)
-                    c = set_reportingunitname(c)
-                    c = set_uniqueid(c)
-
-                    # Get vote totals for each reportingunit.
-                    votecounts = aggregate_votecounts(votecounts, c, r)
-
-                    # Update the dict template we have with real data.
-                    # This makes sure every key has at least the default values.
-                    cru.update(c)
-
-                    # The result is a single dict for each candidate-reportingunit-race.
-                    payload.append(cru)
-
-    # When returning, annotate each reportingunit with vote totals and pcts.
-    return compute_pcts(payload, votecounts)
+
+def load_results(electiondate, races):
+    """
+    Given a list of AP JSON races, returns candidate-reportingunit-race
+    objects, e.g., results.
+    """
+    return list(iter_results(electiondate, races))
+
+
+def diff_results(old, new):
+    """
+    Given the results of a previous snapshot and the current one, yields
+    only the current rows that were added or whose ``DELTA_KEYS`` changed,
+    followed by the previous rows that no longer exist. Rows are matched on
+    ``ROW_KEYS``, since AP reuses polids such as '0' within a race and
+    ``id`` is not unique, and each one carries a ``delta`` of 'added',
+    'changed' or 'deleted'.
+
+    The previous results are indexed as tuples in ``KEY_ORDER`` rather than
+    dicts, while the current results are streamed.
+    """
+    row_key = operator.itemgetter(*ROW_KEYS)
+    row_values = operator.itemgetter(*KEY_ORDER)
+    delta_values = operator.itemgetter(*DELTA_KEYS)
+    delta_index = operator.itemgetter(*(KEY_ORDER.index(k) for k in DELTA_KEYS))
+
+    previous = {}
+    order = []
+    for p in old:
+        k = row_key(p)
+        previous[k] = row_values(p)
+        order.append(k)
+
+    for p in new:
+        values = previous.pop(row_key(p), None)
+        if values is None:
+            p['delta'] = 'added'
+        elif delta_index(values) != delta_values(p):
+            p['delta'] = 'changed'
+        else:
+            continue
+        yield p
+
+    for k in order:
+        if k in previous:
+            p = dict(zip(KEY_ORDER, previous[k]))
+            p['delta'] = 'deleted'
+            yield p
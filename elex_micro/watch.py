@@ -0,0 +1,122 @@
+"""
+Watch mode.
+
+``Watcher`` polls an AP snapshot with ``os.stat`` and reprocesses it only
+when its contents change: a new mtime or size prompts a hash of the file,
+and the snapshot is only processed if the hash differs from the last one
+processed. ``write_atomic`` writes output to a temp file next to the
+target and renames it into place, so readers never see a partial file.
+
+The watched file should be replaced the same way. A file truncated and
+rewritten in place can be read half-written, and one that is memory
+mapped can kill the process with SIGBUS when it shrinks under the
+mapping, which is why ``--watch`` refuses ``--mmap``.
+"""
+import io
+import os
+import sys
+import tempfile
+import time
+
+# Seconds between polls.
+DEFAULT_INTERVAL = 1.0
+
+replace = getattr(os, 'replace', os.rename)
+
+
+def text_writer(writefile):
+    """
+    Wraps a binary file for the text writers, which write ``str``. On
+    Python 2, ``str`` is bytes already.
+    """
+    if str is bytes:
+        return writefile
+    return io.TextIOWrapper(writefile, encoding='utf-8', newline='', write_through=True)
+
+
+def write_atomic(path, render):
+    """
+    Calls ``render`` with stdout redirected to a temp file, then renames
+    the temp file to ``path``. If ``render`` fails, ``path`` is left as it
+    was.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, temp_path = tempfile.mkstemp(dir=directory, prefix='.%s.' % os.path.basename(path), suffix='.tmp')
+
+    stdout = sys.stdout
+    try:
+        with os.fdopen(fd, 'wb') as writefile:
+            sys.stdout = text_writer(writefile)
+            try:
+                render()
+                sys.stdout.flush()
+            finally:
+                if sys.stdout is not writefile:
+                    sys.stdout.detach()
+                sys.stdout = stdout
+            os.fsync(writefile.fileno())
+        replace(temp_path, path)
+
+    except BaseException:
+        os.remove(temp_path)
+        raise
+
+
+def stat_signature(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime, st.st_size, st.st_ino)
+
+
+class Watcher(object):
+    """
+    Calls ``process`` whenever the contents of ``file_path`` change, as
+    told apart by ``key(file_path)``.
+    """
+
+    def __init__(self, file_path, process, key, log=sys.stderr):
+        self.file_path = file_path
+        self.process = process
+        self.key = key
+        self.log = log
+        self.signature = None
+        self.last_key = None
+
+    def poll(self):
+        """
+        Checks the file once. Returns True if it was processed.
+        """
+        signature = stat_signature(self.file_path)
+        if signature is None or signature == self.signature:
+            return False
+        self.signature = signature
+
+        # If the file cannot be processed, it is most likely still being
+        # written or replaced: it may not parse, be truncated or be gone.
+        # The previous output is kept, and the file is tried again once
+        # it changes.
+        try:
+            key = self.key(self.file_path)
+            if key == self.last_key:
+                return False
+            self.process()
+        except Exception as e:
+            self.log.write('%s: %s: %s\n' % (self.file_path, type(e).__name__, e))
+            return False
+
+        self.last_key = key
+        return True
+
+    def run(self, interval=DEFAULT_INTERVAL):
+        """
+        Polls the file every ``interval`` seconds until interrupted.
+        """
+        try:
+            while True:
+                if self.poll():
+                    self.log.write('%s: processed %s\n' % (self.file_path, self.last_key))
+                time.sleep(interval)
+        except KeyboardInterrupt:
+            pass
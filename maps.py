@@ -1,7 +1,13 @@
 """
 Defines ``FIPS_TO_STATE``, ``STATE_ABBR``, ``OFFICE_NAMES`` and ``PARTY_NAMES``
-look-up constants.
+look-up constants, and the ``NEW_ENGLAND_STATES`` and ``FIPS_TO_COUNTY``
+tables derived from them.
 """
+try:
+    from types import MappingProxyType
+except ImportError:
+    MappingProxyType = dict
+
 FIPS_TO_STATE = {
     'CT': {
         '09001': 'FAIRFIELD',
@@ -147,6 +153,17 @@ STATE_ABBR = {
     'US': 'National'
 }
 
+# States whose results are reported by township and rolled up to counties.
+NEW_ENGLAND_STATES = frozenset(FIPS_TO_STATE)
+
+# County names of every New England county fips code. Read-only where
+# Python 3 allows it, like NEW_ENGLAND_STATES.
+FIPS_TO_COUNTY = MappingProxyType(dict(
+    (fips, name)
+    for counties in FIPS_TO_STATE.values()
+    for fips, name in counties.items()
+))
+
 OFFICE_NAMES = {
     'A': 'Attorney General',
     'C': 'Controller or Comptroller',
@@ -30,11 +30,18 @@ setup(
             'reportingunits = elex_micro.reportingunits:main',
             'races = elex_micro.races:main',
             'candidates = elex_micro.candidates:main',
+            'results-server = elex_micro.server:main',
+            'results-fetch = elex_micro.fetch:main',
         ),
     },
     license="Apache License 2.0",
     keywords='election race candidate democracy news associated press',
     install_requires=reqs,
+    extras_require={
+        'columnar': ['numpy'],
+        'arrow': ['pyarrow'],
+        'zstd': ['zstandard'],
+    },
     classifiers=(
         'Development Status :: 5 - Production/Stable',
         'Intended Audience :: Developers',
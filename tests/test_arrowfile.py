@@ -0,0 +1,56 @@
+import io
+import unittest
+
+import arrowfile
+import utils
+
+
+@unittest.skipIf(arrowfile.pyarrow is None, 'pyarrow is not installed')
+class TestArrowOutput(unittest.TestCase):
+    data_url = 'tests/data/20160426_ct_rollups.json'
+
+    def setUp(self):
+        electiondate, races = utils.open_file(self.data_url)
+        self.payload = utils.load_results(electiondate, races)
+
+    def assertRowsMatch(self, rows):
+        self.assertEqual(len(rows), len(self.payload))
+        for row, p in zip(rows, self.payload):
+            expected = dict((k, p[k]) for k in utils.KEY_ORDER)
+            expected['winner'] = arrowfile.winner_flag(p['winner'])
+            self.assertEqual(row, expected)
+
+    def test_parquet_round_trip(self):
+        out = io.BytesIO()
+        arrowfile.write_parquet(iter(self.payload), out, batch_size=1000)
+        out.seek(0)
+
+        parquet_file = arrowfile.pyarrow.parquet.ParquetFile(out)
+        self.assertEqual(parquet_file.num_row_groups, 9)
+        self.assertEqual(parquet_file.schema_arrow, arrowfile.schema())
+        self.assertRowsMatch(parquet_file.read().to_pylist())
+
+    def test_arrow_round_trip(self):
+        out = io.BytesIO()
+        arrowfile.write_arrow(iter(self.payload), out, batch_size=1000)
+        out.seek(0)
+
+        reader = arrowfile.pyarrow.ipc.open_file(out)
+        self.assertEqual(reader.num_record_batches, 9)
+        self.assertRowsMatch(reader.read_all().to_pylist())
+
+    def test_column_types(self):
+        schema = arrowfile.schema()
+        self.assertEqual(schema.field('votecount').type, arrowfile.pyarrow.int64())
+        self.assertEqual(schema.field('votepct').type, arrowfile.pyarrow.float64())
+        self.assertEqual(schema.field('winner').type, arrowfile.pyarrow.bool_())
+        self.assertEqual(schema.field('raceid').type, arrowfile.pyarrow.string())
+
+    def test_winner_flag(self):
+        self.assertEqual([arrowfile.winner_flag(v) for v in (True, 'N', None)], [True, False, None])
+
+    def test_empty(self):
+        out = io.BytesIO()
+        arrowfile.write_parquet(iter([]), out)
+        out.seek(0)
+        self.assertEqual(arrowfile.pyarrow.parquet.read_table(out).num_rows, 0)
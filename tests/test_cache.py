@@ -0,0 +1,52 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+import cache
+import utils
+
+
+class TestResultCache(unittest.TestCase):
+    data_url = 'tests/data/20151103_national.json'
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cache = cache.ResultCache(self.directory)
+        self.electiondate, races = utils.open_file(self.data_url)
+        self.candidate_reporting_units = utils.load_results(self.electiondate, races)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def test_key_has_timestamp(self):
+        key = self.cache.key(self.data_url)
+        self.assertTrue(key.startswith('20151110T185518832Z-'))
+
+    def test_key_depends_on_races(self):
+        self.assertNotEqual(
+            self.cache.key(self.data_url),
+            self.cache.key(self.data_url, ['7582'])
+        )
+
+    def test_miss_then_hit(self):
+        key = self.cache.key(self.data_url)
+        self.assertEqual(self.cache.get(key), None)
+
+        results = list(cache.cached_results(self.cache, self.data_url))
+        self.assertEqual(results, self.candidate_reporting_units)
+
+        self.assertEqual(list(self.cache.get(key)), self.candidate_reporting_units)
+
+    def test_unfinished_results_are_not_cached(self):
+        key = self.cache.key(self.data_url)
+        results = cache.cached_results(self.cache, self.data_url)
+        next(results)
+        results.close()
+        self.assertEqual(self.cache.get(key), None)
+        self.assertEqual(os.listdir(self.directory), [])
+
+    def test_eviction(self):
+        self.cache.max_bytes = 1
+        list(self.cache.put('a', self.candidate_reporting_units))
+        self.assertEqual(os.listdir(self.directory), [])
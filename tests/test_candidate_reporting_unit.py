@@ -99,3 +99,26 @@ class TestCandidateReportingUnit(unittest.TestCase):
     def test_candidate_reporting_unit_get_units_construction_votepct(self):
         cru = self.candidate_reporting_units[(4 * 64) + 1]
         self.assertEqual(cru['votepct'], 0.45652173913043476)
+
+
+class TestRowTemplate(unittest.TestCase):
+
+    def test_lowercase_fields(self):
+        fields, camelcased = utils.lowercase_fields(
+            {'raceID': '1', 'level': 'state', 'precinctsReportingPct': 50.0, 'candidates': []},
+            ('candidates',)
+        )
+        self.assertEqual(fields, {'raceid': '1', 'level': 'state', 'precinctsreportingpct': 0.5})
+        self.assertEqual(camelcased, set(['raceid', 'precinctsreportingpct']))
+
+    def test_shared_fields_win(self):
+        fields = {'party': 'GOP', 'level': 'township'}
+        overridden = utils.merge_candidate(fields, set(), {'party': 'Dem', 'level': 'subunit', 'voteCount': 5})
+        self.assertFalse(overridden)
+        self.assertEqual(fields, {'party': 'GOP', 'level': 'township', 'votecount': 5})
+
+    def test_lowercase_candidate_fields_override_camelcased(self):
+        fields = {'reportingunitid': 'MA-25005'}
+        overridden = utils.merge_candidate(fields, set(['reportingunitid']), {'reportingunitid': 'subunit-1'})
+        self.assertTrue(overridden)
+        self.assertEqual(fields, {'reportingunitid': 'subunit-1'})
@@ -0,0 +1,38 @@
+import unittest
+
+import columnar
+import utils
+
+
+@unittest.skipIf(columnar.numpy is None, 'numpy is not installed')
+class TestColumnarResults(unittest.TestCase):
+    data_url = 'tests/data/20160301_super_tuesday.json'
+
+    def setUp(self):
+        electiondate, races = utils.open_file(self.data_url)
+        self.candidate_reporting_units = utils.load_results(electiondate, races)
+        electiondate, races = utils.open_file(self.data_url)
+        self.results = columnar.load_results_columnar(electiondate, races)
+
+    def test_length(self):
+        self.assertEqual(len(self.results), len(self.candidate_reporting_units))
+
+    def test_rows_match_load_results(self):
+        self.assertEqual(list(self.results), self.candidate_reporting_units)
+
+    def test_numeric_columns_are_arrays(self):
+        self.assertEqual(self.results['votecount'].dtype, columnar.numpy.int64)
+        self.assertEqual(self.results['votepct'].dtype, columnar.numpy.float64)
+        self.assertEqual(
+            self.results['votecount'].tolist(),
+            [c['votecount'] for c in self.candidate_reporting_units]
+        )
+
+    def test_string_columns_are_dictionary_encoded(self):
+        raceids = self.results['raceid']
+        self.assertEqual(sorted(raceids.values), ['24547', '24548'])
+        self.assertEqual(raceids.decode(), [c['raceid'] for c in self.candidate_reporting_units])
+
+    def test_null_mask(self):
+        self.assertTrue(self.results.nulls['delegatecount'].all())
+        self.assertEqual(self.results.row(0)['delegatecount'], None)
@@ -0,0 +1,62 @@
+import gzip
+import os
+import shutil
+import tempfile
+import unittest
+
+import compressed
+import jsonstream
+import utils
+
+
+class TestCompressedInput(unittest.TestCase):
+    """
+    Compressed copies of a file should give the same results as the file.
+    """
+    data_url = 'tests/data/20160426_ct_rollups.json'
+
+    def setUp(self):
+        with open(self.data_url, 'rb') as readfile:
+            self.data = readfile.read()
+
+        electiondate, races = utils.open_file(self.data_url)
+        self.races = races
+        self.directory = tempfile.mkdtemp()
+
+        self.gzip_path = os.path.join(self.directory, 'results.json.gz')
+        writefile = gzip.open(self.gzip_path, 'wb')
+        try:
+            writefile.write(self.data)
+        finally:
+            writefile.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def assertSameRaces(self, path):
+        for stream in (False, True):
+            for use_mmap in (False, True):
+                electiondate, races = utils.open_file(path, stream=stream, use_mmap=use_mmap)
+                self.assertEqual(electiondate, '2016-04-26')
+                self.assertEqual(list(races), self.races)
+
+    def test_detect(self):
+        self.assertEqual(compressed.detect(self.data_url), None)
+        self.assertEqual(compressed.detect(self.gzip_path), 'gzip')
+
+    def test_gzip(self):
+        self.assertSameRaces(self.gzip_path)
+
+    def test_filtered_raw_races(self):
+        races = jsonstream.open_races(self.gzip_path, raw=True, race_filter=jsonstream.RaceFilter(['7002']))
+        self.assertEqual(len(list(races)), 1)
+        self.assertTrue(races.readfile.closed)
+
+    @unittest.skipIf(compressed.zstandard is None, 'zstandard is not installed')
+    def test_zstd(self):
+        zstd_path = os.path.join(self.directory, 'results.json.zst')
+        with open(zstd_path, 'wb') as writefile:
+            writefile.write(compressed.zstandard.ZstdCompressor().compress(self.data))
+
+        self.assertEqual(compressed.detect(zstd_path), 'zstd')
+        self.assertSameRaces(zstd_path)
@@ -0,0 +1,55 @@
+import copy
+import unittest
+
+import utils
+
+
+class TestDiffResults(unittest.TestCase):
+    """
+    Only rows that changed between snapshots should be returned.
+    """
+    data_url = 'tests/data/20151103_national.json'
+
+    def setUp(self):
+        self.electiondate, races = utils.open_file(self.data_url)
+        self.old = utils.load_results(self.electiondate, races)
+        self.new = copy.deepcopy(self.old)
+
+    def test_unchanged_snapshot(self):
+        self.assertEqual(list(utils.diff_results(self.old, self.new)), [])
+
+    def test_changed_votecount(self):
+        self.new[10]['votecount'] += 1
+        self.new[20]['winner'] = 'R'
+        delta = list(utils.diff_results(self.old, self.new))
+        self.assertEqual([d['id'] for d in delta], [self.new[10]['id'], self.new[20]['id']])
+        self.assertEqual([d['delta'] for d in delta], ['changed', 'changed'])
+
+    def test_other_fields_are_ignored(self):
+        self.new[10]['lastupdated'] = '2015-11-04T00:00:00Z'
+        self.assertEqual(list(utils.diff_results(self.old, self.new)), [])
+
+    def test_added_and_deleted(self):
+        deleted = self.new.pop(0)
+        added = dict(self.new[0], id='added-id', polnum='added')
+        self.new.append(added)
+        delta = list(utils.diff_results(self.old, self.new))
+        self.assertEqual([d['delta'] for d in delta], ['added', 'deleted'])
+        self.assertEqual(delta[0]['id'], 'added-id')
+        self.assertEqual(delta[1]['id'], deleted['id'])
+        self.assertEqual(delta[1]['votecount'], deleted['votecount'])
+
+    def rows(self, *rows):
+        return [dict(dict.fromkeys(utils.KEY_ORDER), id='22417-polid-0-MD-1', **r) for r in rows]
+
+    def test_repeated_ids(self):
+        old = self.rows({'polnum': '1', 'votecount': 1}, {'polnum': '2', 'votecount': 2})
+        new = self.rows({'polnum': '1', 'votecount': 1}, {'polnum': '2', 'votecount': 3})
+        delta = list(utils.diff_results(old, new))
+        self.assertEqual([(d['polnum'], d['votecount']) for d in delta], [('2', 3)])
+
+    def test_reordered_repeated_ids(self):
+        # AP may list the polid '0' candidates of a unit in another order.
+        old = self.rows({'polnum': '1', 'votecount': 1}, {'polnum': '2', 'votecount': 2})
+        new = list(reversed(old))
+        self.assertEqual(list(utils.diff_results(old, new)), [])
@@ -0,0 +1,159 @@
+import os
+import shutil
+import tempfile
+import unittest
+import zlib
+
+try:
+    import asyncio
+except ImportError:
+    asyncio = None
+
+import fetch
+import jsonstream
+import mockap
+import utils
+
+
+@unittest.skipIf(asyncio is None, 'asyncio is not installed')
+class TestAPClient(unittest.TestCase):
+    data_url = 'tests/data/20160426_ct_rollups.json'
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, '20160426.json')
+        shutil.copy(self.data_url, self.path)
+
+        self.loop = asyncio.new_event_loop()
+        self.server = mockap.MockAPServer(self.loop, files={
+            '2016-04-26': self.path,
+            '2016-03-01': 'tests/data/20160301_super_tuesday.json',
+        })
+        port = self.server.start()
+        self.client = fetch.APClient(self.loop, '127.0.0.1', port, use_ssl=False, api_key='key')
+
+    def tearDown(self):
+        self.client.close()
+        self.server.stop()
+        self.loop.run_until_complete(asyncio.sleep(0))
+        self.loop.close()
+        shutil.rmtree(self.directory)
+
+    def run_until_complete(self, *futures):
+        return self.loop.run_until_complete(asyncio.gather(*futures))
+
+    def expected_races(self, file_path):
+        return utils.open_file(file_path)[1]
+
+    def test_fetches_gzipped_races(self):
+        races = []
+        snapshot, = self.run_until_complete(self.client.election('2016-04-26', on_race=races.append))
+        self.assertEqual(snapshot.status, 200)
+        self.assertEqual(snapshot.headers['content-encoding'], 'gzip')
+        self.assertEqual(snapshot.headers['transfer-encoding'], 'chunked')
+        self.assertEqual(snapshot.electiondate, '2016-04-26')
+        self.assertEqual(races, self.expected_races(self.path))
+        self.assertEqual(snapshot.count, len(races))
+
+        request_line, headers = self.server.requests[0]
+        self.assertIn('apiKey=key', request_line)
+        self.assertIn('level=ru', request_line)
+        self.assertEqual(headers['accept-encoding'], 'gzip')
+
+    def test_not_modified(self):
+        self.run_until_complete(self.client.election('2016-04-26'))
+        snapshot, = self.run_until_complete(self.client.election('2016-04-26'))
+        self.assertTrue(snapshot.not_modified)
+        self.assertIsNone(snapshot.count)
+        self.assertIn('if-none-match', self.server.requests[1][1])
+        self.assertIn('if-modified-since', self.server.requests[1][1])
+
+        with open(self.path, 'rb') as readfile:
+            data = readfile.read()
+        with open(self.path, 'wb') as writefile:
+            writefile.write(data.replace(b'"Trump"', b'"Trump "'))
+        races = []
+        snapshot, = self.run_until_complete(self.client.election('2016-04-26', on_race=races.append))
+        self.assertEqual(snapshot.status, 200)
+        self.assertEqual(races, self.expected_races(self.path))
+
+    def test_pipelines_on_one_connection(self):
+        for i in range(2):
+            snapshots = self.run_until_complete(
+                self.client.election('2016-04-26'),
+                self.client.election('2016-03-01', race_filter=jsonstream.RaceFilter(['7002']))
+            )
+        self.assertEqual(self.server.connections, 1)
+        self.assertEqual(self.client.connections, 1)
+        self.assertEqual(len(self.server.requests), 4)
+        self.assertTrue(all(s.not_modified for s in snapshots))
+
+    def test_race_filter(self):
+        races = []
+        snapshot, = self.run_until_complete(
+            self.client.election('2016-04-26', race_filter=jsonstream.RaceFilter(['7002']), on_race=races.append)
+        )
+        self.assertEqual(set(r['raceID'] for r in races), set(['7002']))
+        self.assertEqual(snapshot.count, len(races))
+
+    def test_reconnects(self):
+        self.server.keep_alive = False
+        races = []
+        self.run_until_complete(
+            self.client.election('2016-04-26'),
+            self.client.election('2016-03-01', on_race=races.append)
+        )
+        self.assertEqual(self.server.connections, 2)
+        self.assertEqual(races, self.expected_races('tests/data/20160301_super_tuesday.json'))
+
+    def test_reconnects_for_each_pipelined_request(self):
+        # Requests pipelined behind a Connection: close response were never
+        # answered, so sending them again must not use up their attempts.
+        self.server.keep_alive = False
+        snapshots = self.run_until_complete(
+            self.client.election('2016-04-26'),
+            self.client.election('2016-03-01'),
+            self.client.election('2015-11-03')
+        )
+        self.assertEqual(self.server.connections, 3)
+        self.assertEqual(snapshots[2].electiondate, '2015-11-03')
+
+    def test_outfile(self):
+        outfile = os.path.join(self.directory, 'snapshot.json')
+        self.run_until_complete(self.client.election('2016-04-26', outfile=outfile))
+        self.assertEqual(utils.open_file(outfile), utils.open_file(self.path))
+        self.assertEqual(sorted(os.listdir(self.directory)), ['20160426.json', 'snapshot.json'])
+
+    def test_malformed_body(self):
+        with open(self.path, 'rb') as readfile:
+            data = readfile.read()
+        with open(self.path, 'wb') as writefile:
+            writefile.write(data.replace(b'"Trump"', b'"Trump"x', 1))
+
+        outfile = os.path.join(self.directory, 'snapshot.json')
+        future = self.client.election('2016-04-26', outfile=outfile)
+        self.assertRaises(ValueError, self.loop.run_until_complete, future)
+        self.assertEqual(os.listdir(self.directory), ['20160426.json'])
+
+    def test_corrupt_gzip_body(self):
+        respond = self.server.respond
+
+        def corrupt(path, headers):
+            status, headers, body = respond(path, headers)
+            return status, headers, body[:20] + b'\xff' * 64 + body[20:]
+        self.server.respond = corrupt
+
+        outfile = os.path.join(self.directory, 'snapshot.json')
+        future = self.client.election('2016-04-26', outfile=outfile)
+        self.assertRaises(zlib.error, self.loop.run_until_complete, future)
+        self.assertEqual(os.listdir(self.directory), ['20160426.json'])
+        self.assertEqual(len(self.server.requests), 1)
+
+        # The client recovers on a new connection.
+        self.server.respond = respond
+        snapshot, = self.run_until_complete(self.client.election('2016-04-26'))
+        self.assertEqual(snapshot.status, 200)
+
+    def test_not_found(self):
+        future = self.client.election('2000-01-01')
+        self.assertRaises(fetch.FetchError, self.loop.run_until_complete, future)
@@ -0,0 +1,90 @@
+import argparse
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+import instrument
+import results
+import utils
+
+
+class TestInstrument(unittest.TestCase):
+    data_url = 'tests/data/20160426_ct_rollups.json'
+
+    def setUp(self):
+        self.timings = []
+        instrument.register(self.callback)
+
+    def tearDown(self):
+        instrument.unregister(self.callback)
+
+    def callback(self, stage, seconds, count):
+        self.timings.append((stage, seconds, count))
+
+    def run_pipeline(self, **kwargs):
+        stats = instrument.Stats()
+        payload = stats.run(lambda: list(stats.written(instrument.iter_results(stats, self.data_url, **kwargs))))
+        return stats, payload
+
+    def test_same_results(self):
+        electiondate, races = utils.open_file(self.data_url)
+        expected = utils.load_results(electiondate, races)
+        self.assertEqual(self.run_pipeline()[1], expected)
+        self.assertEqual(self.run_pipeline(use_mmap=True)[1], expected)
+
+    def test_stages(self):
+        stats, payload = self.run_pipeline(race_ids=['7002'])
+        record = stats.as_dict()
+        self.assertEqual(list(record['stages']), [stage for stage, unit in instrument.STAGES])
+        self.assertEqual(record['rows'], len(payload))
+        self.assertEqual(record['stages']['read']['bytes'], os.path.getsize(self.data_url))
+        self.assertEqual(record['stages']['parse']['races'], 1)
+        self.assertEqual(record['stages']['transform']['rows'], len(payload))
+        self.assertTrue(record['stages']['write']['rows_per_second'] > 0)
+
+    def test_callbacks(self):
+        stats, payload = self.run_pipeline()
+        self.assertEqual(set(stage for stage, seconds, count in self.timings), set(stats.seconds))
+        self.assertEqual(sum(count for stage, seconds, count in self.timings if stage == 'pcts'), len(payload))
+        self.assertEqual(self.timings[-1][0], 'write')
+
+    def test_write(self):
+        stats = self.run_pipeline()[0]
+        fd, path = tempfile.mkstemp()
+        os.close(fd)
+        try:
+            stats.write(path)
+            stats.write(path)
+            with open(path) as readfile:
+                lines = [json.loads(line) for line in readfile]
+        finally:
+            os.remove(path)
+        self.assertEqual(len(lines), 2)
+        self.assertEqual(lines[0]['rows'], stats.counts['write'])
+
+    def test_since(self):
+        args = argparse.Namespace(
+            file=self.data_url, since=self.data_url, sqlite=None, json=False, tsv=False,
+            output=None, workers=1, mmap=False
+        )
+        stats = instrument.Stats()
+        stdout = sys.stdout
+        sys.stdout = StringIO()
+        try:
+            stats.run(lambda: results.write_results(args, stats=stats))
+        finally:
+            sys.stdout = stdout
+
+        # Both snapshots are transformed, but nothing changed between them.
+        electiondate, races = utils.open_file(self.data_url)
+        rows = len(utils.load_results(electiondate, races))
+        record = stats.as_dict()
+        self.assertEqual(record['rows'], 0)
+        self.assertEqual(record['stages']['transform']['rows'], 2 * rows)
@@ -0,0 +1,170 @@
+import random
+import unittest
+
+import ujson
+
+import jsonstream
+import utils
+
+
+class TestRaceStream(unittest.TestCase):
+    """
+    Races parsed incrementally should match a full parse of the file.
+    """
+    data_url = 'tests/data/20160301_super_tuesday.json'
+
+    def setUp(self):
+        with open(self.data_url, 'rb') as readfile:
+            self.parsed_json = ujson.loads(readfile.read())
+
+    def test_races_match_full_parse(self):
+        races = list(jsonstream.open_races(self.data_url))
+        self.assertEqual(races, self.parsed_json['races'])
+
+    def test_races_match_full_parse_small_chunks(self):
+        races = list(jsonstream.open_races(self.data_url, chunk_size=7))
+        self.assertEqual(races, self.parsed_json['races'])
+
+    def test_raw_races_decode_to_full_parse(self):
+        for chunk_size in (7, jsonstream.CHUNK_SIZE):
+            races = jsonstream.open_races(self.data_url, chunk_size=chunk_size, raw=True)
+            self.assertEqual([ujson.loads(r) for r in races], self.parsed_json['races'])
+
+    def test_mapped_races_match_full_parse(self):
+        races = jsonstream.open_races(self.data_url, use_mmap=True)
+        self.assertEqual(races.electiondate, '2016-03-01')
+        self.assertEqual(list(races), self.parsed_json['races'])
+        self.assertTrue(races.readfile.closed)
+
+    def test_mapped_raw_races_decode_to_full_parse(self):
+        races = jsonstream.open_races(self.data_url, raw=True, use_mmap=True)
+        self.assertEqual([ujson.loads(r) for r in races], self.parsed_json['races'])
+
+    def test_load_mapped(self):
+        self.assertEqual(jsonstream.load_mapped(self.data_url), self.parsed_json)
+
+    def test_header_before_races(self):
+        reader = jsonstream.open_races(self.data_url)
+        self.assertEqual(reader.electiondate, '2016-03-01')
+        self.assertEqual(reader.header['timestamp'], self.parsed_json['timestamp'])
+
+    def test_header_after_races(self):
+        reader = jsonstream.open_races(self.data_url)
+        list(reader)
+        self.assertEqual(reader.header['nextrequest'], self.parsed_json['nextrequest'])
+
+    def test_feed(self):
+        parser = jsonstream.RaceStream()
+        races = []
+        races.extend(parser.feed(b'{"electionDate": "2016-03-01", "races": [{"raceID": "1"'))
+        self.assertEqual(races, [])
+        races.extend(parser.feed(b'}, {"raceID": "2", "description": "a \\"]}\\""}]}'))
+        parser.close()
+        self.assertEqual(parser.header, {'electionDate': '2016-03-01'})
+        self.assertEqual(races, [{'raceID': '1'}, {'raceID': '2', 'description': 'a "]}"'}])
+
+    def test_truncated_file(self):
+        parser = jsonstream.RaceStream()
+        parser.feed(b'{"electionDate": "2016-03-01", "races": [{"raceID": "1"}')
+        self.assertRaises(ValueError, parser.close)
+
+    def test_brackets_in_strings(self):
+        # Names full of brackets must not fool the guess at where a race ends.
+        rng = random.Random(0)
+
+        def name():
+            return ''.join(rng.choice(['[', ']', '{', '}', '[{', ']}', ']}]}', '"', '\\', 'a'])
+                           for i in range(rng.randint(0, 8)))
+
+        races = []
+        for i in range(200):
+            race = {'raceID': str(i), 'description': name()}
+            if rng.random() < 0.7:
+                race['reportingUnits'] = [
+                    {'candidates': [{'last': name()} for j in range(rng.randint(1, 3))]}
+                    for k in range(rng.randint(1, 3))
+                ]
+            races.append(race)
+        data = ujson.dumps({'electionDate': '2016-03-01', 'races': races}).encode('utf-8')
+
+        race_filter = jsonstream.RaceFilter([str(i) for i in range(0, 200, 3)])
+        for chunk_size in (7, 1024, len(data)):
+            for raw in (False, True):
+                for f in (None, race_filter):
+                    parser = jsonstream.RaceStream(raw=raw, race_filter=f)
+                    parsed = []
+                    for i in range(0, len(data), chunk_size):
+                        parsed.extend(parser.feed(data[i:i + chunk_size]))
+                    parser.close()
+                    if raw:
+                        parsed = [ujson.loads(r) for r in parsed]
+                    self.assertEqual(parsed, [r for r in races if f is None or f.match(r)])
+
+
+class TestStreamedResults(unittest.TestCase):
+    data_url = 'tests/data/20160426_ct_rollups.json'
+
+    def test_streamed_results_match_loaded_results(self):
+        electiondate, races = utils.open_file(self.data_url)
+        loaded = utils.load_results(electiondate, races)
+
+        electiondate, races = utils.open_file(self.data_url, stream=True)
+        self.assertEqual(electiondate, '2016-04-26')
+        self.assertEqual(list(utils.iter_results(electiondate, races)), loaded)
+
+
+class TestRaceFilter(unittest.TestCase):
+    """
+    Filtering while parsing should match filtering the full parse.
+    """
+    data_url = 'tests/data/20160426_ct_rollups.json'
+
+    def setUp(self):
+        with open(self.data_url, 'rb') as readfile:
+            self.races = ujson.loads(readfile.read())['races']
+
+    def state(self, race):
+        return race.get('statePostal', None) or race['reportingUnits'][0]['statePostal']
+
+    def assertFiltered(self, expected, **kwargs):
+        self.assertTrue(expected)
+        race_filter = jsonstream.RaceFilter(**kwargs)
+        for chunk_size in (7, jsonstream.CHUNK_SIZE):
+            races = list(jsonstream.open_races(self.data_url, chunk_size=chunk_size, race_filter=race_filter))
+            self.assertEqual(races, expected)
+
+            races = jsonstream.open_races(self.data_url, chunk_size=chunk_size, raw=True, race_filter=race_filter)
+            self.assertEqual([ujson.loads(r) for r in races], expected)
+
+    def test_race_ids(self):
+        expected = [r for r in self.races if r['raceID'] in ('7002', '22415')]
+        self.assertFiltered(expected, race_ids=['7002', '22415'])
+
+    def test_states(self):
+        expected = [r for r in self.races if self.state(r) in ('CT', 'RI')]
+        self.assertFiltered(expected, states=['CT', 'RI'])
+
+    def test_offices(self):
+        expected = [r for r in self.races if r['officeID'] == 'P']
+        self.assertFiltered(expected, offices=['P'])
+
+    def test_criteria_combine(self):
+        expected = [r for r in self.races if r['officeID'] == 'P' and self.state(r) == 'CT']
+        self.assertFiltered(expected, states=['CT'], offices=['P'])
+
+    def test_match_decoded_race(self):
+        race_filter = jsonstream.RaceFilter(states=['MD'], offices=['H'])
+        for r in self.races:
+            self.assertEqual(race_filter.match(r), race_filter.match_raw(ujson.dumps(r).encode('utf-8')))
+
+    def test_open_file(self):
+        for stream in (False, True):
+            for use_mmap in (False, True):
+                electiondate, races = utils.open_file(self.data_url, ['7002', '7003'], stream=stream,
+                                                      use_mmap=use_mmap)
+                self.assertEqual([r['raceID'] for r in races], ['7002', '7003'])
+
+    def test_no_matches(self):
+        races = jsonstream.open_races(self.data_url, race_filter=jsonstream.RaceFilter(['0']))
+        self.assertEqual(list(races), [])
+        self.assertEqual(races.electiondate, '2016-04-26')
@@ -0,0 +1,29 @@
+import unittest
+
+import kernels
+
+
+class TestGroupPcts(unittest.TestCase):
+    votecount = [3, 1, 0, 0, 5]
+    groups = ['a', 'a', 'b', 'b', 'c']
+
+    def test_python_kernel(self):
+        totals, pcts = kernels.group_pcts_python(self.votecount, self.groups)
+        self.assertEqual(totals, [4, 4, 0, 0, 5])
+        self.assertEqual(pcts, [0.75, 0.25, None, None, 1.0])
+
+    @unittest.skipIf(kernels.numpy is None, 'numpy is not installed')
+    def test_numpy_kernel_matches_python(self):
+        totals, pcts = kernels.group_pcts_numpy(self.votecount, kernels.group_codes(self.groups))
+        self.assertEqual(totals.tolist(), [4, 4, 0, 0, 5])
+        self.assertEqual(pcts[:2].tolist(), [0.75, 0.25])
+        self.assertTrue(kernels.numpy.isnan(pcts[2:4]).all())
+
+    @unittest.skipIf(kernels.numpy is None, 'numpy is not installed')
+    def test_large_batches_use_numpy(self):
+        votecount = list(range(kernels.NUMPY_THRESHOLD)) + [0, 0]
+        groups = [i % 7 for i in range(kernels.NUMPY_THRESHOLD)] + ['zero', 'zero']
+        self.assertEqual(
+            kernels.group_pcts(votecount, groups),
+            kernels.group_pcts_python(votecount, groups)
+        )
@@ -148,6 +148,21 @@ class TestMaineEdgeCaseReportingUnits(unittest.TestCase):
         self.assertEqual(len(maine_subunits), 10)
 
 
+class TestNewEnglandMaps(unittest.TestCase):
+    """
+    The derived lookup tables should agree with FIPS_TO_STATE.
+    """
+
+    def test_new_england_states(self):
+        self.assertEqual(maps.NEW_ENGLAND_STATES, frozenset(['CT', 'MA', 'ME', 'NH', 'RI', 'VT']))
+
+    def test_fips_to_county(self):
+        for state_postal, counties in maps.FIPS_TO_STATE.items():
+            for fips, name in counties.items():
+                self.assertEqual(maps.FIPS_TO_COUNTY[fips], name)
+        self.assertEqual(len(maps.FIPS_TO_COUNTY), sum(len(c) for c in maps.FIPS_TO_STATE.values()))
+
+
 # class TestNewEnglandReportingUnits(unittest.TestCase):
 #     data_url = 'tests/data/20121106_me_fl_senate.json'
 #     NE_STATES = maps.FIPS_TO_STATE.keys()
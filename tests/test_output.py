@@ -0,0 +1,117 @@
+import csv
+import unittest
+
+try:
+    from cStringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+import ujson
+
+import utils
+
+
+class TestWriteCSV(unittest.TestCase):
+    """
+    The batched CSV writer should write exactly what csv.DictWriter does.
+    """
+    data_url = 'tests/data/20160426_ct_rollups.json'
+
+    def setUp(self):
+        electiondate, races = utils.open_file(self.data_url)
+        self.payload = utils.load_results(electiondate, races)
+
+    def dictwriter(self, payload, fieldnames=utils.KEY_ORDER):
+        out = StringIO()
+        writer = csv.DictWriter(out, fieldnames=fieldnames)
+        writer.writeheader()
+        for p in payload:
+            writer.writerow(p)
+        return out.getvalue()
+
+    def write_csv(self, payload, fieldnames=utils.KEY_ORDER, batch_size=utils.OUTPUT_BATCH_SIZE):
+        out = StringIO()
+        utils.write_csv(iter(payload), out, fieldnames, batch_size)
+        return out.getvalue()
+
+    def test_matches_dictwriter(self):
+        self.assertEqual(self.write_csv(self.payload), self.dictwriter(self.payload))
+
+    def test_batch_size(self):
+        self.assertEqual(self.write_csv(self.payload, batch_size=7), self.dictwriter(self.payload))
+
+    def test_missing_fields_are_blank(self):
+        payload = [dict(self.payload[0], delta='added'), self.payload[1]]
+        self.assertEqual(
+            self.write_csv(payload, utils.DELTA_KEY_ORDER),
+            self.dictwriter(payload, utils.DELTA_KEY_ORDER)
+        )
+
+    def test_empty(self):
+        self.assertEqual(self.write_csv([]), self.dictwriter([]))
+
+
+class TestWriteJSON(unittest.TestCase):
+    data_url = 'tests/data/20160426_ct_rollups.json'
+
+    def setUp(self):
+        electiondate, races = utils.open_file(self.data_url)
+        self.payload = utils.load_results(electiondate, races)
+
+        # ujson rounds floats, so compare against a ujson round trip.
+        self.expected = ujson.loads(ujson.dumps(self.payload))
+
+    def test_json_array(self):
+        for batch_size in (7, utils.OUTPUT_BATCH_SIZE):
+            out = StringIO()
+            utils.write_json(iter(self.payload), out, batch_size)
+            self.assertEqual(ujson.loads(out.getvalue()), self.expected)
+
+    def test_empty_json_array(self):
+        out = StringIO()
+        utils.write_json(iter([]), out)
+        self.assertEqual(out.getvalue(), '[]')
+
+    def test_jsonl(self):
+        out = StringIO()
+        utils.write_jsonl(iter(self.payload), out, 7)
+        lines = out.getvalue().split('\n')
+        self.assertEqual(lines.pop(), '')
+        self.assertEqual([ujson.loads(l) for l in lines], self.expected)
+
+
+class TestWriteTSV(unittest.TestCase):
+    data_url = 'tests/data/20160426_ct_rollups.json'
+
+    def setUp(self):
+        electiondate, races = utils.open_file(self.data_url)
+        self.payload = utils.load_results(electiondate, races)
+
+    def write_tsv(self, payload, batch_size=utils.OUTPUT_BATCH_SIZE):
+        out = StringIO()
+        utils.write_tsv(iter(payload), out, batch_size=batch_size)
+        return out.getvalue()
+
+    def test_matches_csv_values(self):
+        out = StringIO()
+        utils.write_csv(iter(self.payload), out)
+        out.seek(0)
+        expected = list(csv.reader(out))
+
+        lines = self.write_tsv(self.payload, 7).split('\n')
+        self.assertEqual(lines.pop(), '')
+        self.assertEqual([l.split('\t') for l in lines], expected)
+
+    def test_header(self):
+        header = self.write_tsv([]).split('\n')[0]
+        self.assertEqual(tuple(header.split('\t')), utils.KEY_ORDER)
+
+    def test_escapes(self):
+        p = dict(self.payload[0], description='a\tb\nc\rd\\e "f"', last=None, winner=True)
+        row = self.write_tsv([p]).split('\n')[1].split('\t')
+        self.assertEqual(len(row), len(utils.KEY_ORDER))
+
+        values = dict(zip(utils.KEY_ORDER, row))
+        self.assertEqual(values['description'], 'a\\tb\\nc\\rd\\\\e "f"')
+        self.assertEqual(values['last'], '')
+        self.assertEqual(values['winner'], 'True')
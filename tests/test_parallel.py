@@ -0,0 +1,33 @@
+import unittest
+
+import parallel
+import utils
+
+
+class TestParallelResults(unittest.TestCase):
+    """
+    Sharded output should be identical to the single-process output.
+    """
+    data_url = 'tests/data/20160426_ct_rollups.json'
+
+    def setUp(self):
+        self.electiondate, races = utils.open_file(self.data_url)
+        self.candidate_reporting_units = utils.load_results(self.electiondate, races)
+
+    def test_shard_races(self):
+        shards = list(parallel.shard_races([b'abc', b'de', b'f'], shard_size=4))
+        self.assertEqual(shards, [[b'abc', b'de'], [b'f']])
+
+    def test_parallel_csv_matches_serial(self):
+        rendered = parallel.iter_rendered(self.data_url, 2, 'csv', shard_size=64 * 1024)
+        self.assertEqual(
+            ''.join(rendered),
+            parallel.render_csv(self.candidate_reporting_units)
+        )
+
+    def test_parallel_json_matches_serial(self):
+        rendered = parallel.iter_rendered(self.data_url, 2, 'json', shard_size=64 * 1024)
+        self.assertEqual(
+            ','.join(r for r in rendered if r),
+            parallel.render_json(self.candidate_reporting_units)
+        )
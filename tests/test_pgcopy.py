@@ -0,0 +1,94 @@
+import io
+import struct
+import unittest
+
+import pgcopy
+import utils
+
+
+def read_binary(data, fieldnames=utils.KEY_ORDER):
+    """
+    Decodes COPY binary data back into dicts.
+    """
+    decoders = {
+        'bigint': lambda b: struct.unpack('>q', b)[0],
+        'double precision': lambda b: struct.unpack('>d', b)[0],
+        'boolean': lambda b: struct.unpack('>?', b)[0],
+    }
+
+    assert data.startswith(pgcopy.BINARY_HEADER)
+    pos = len(pgcopy.BINARY_HEADER)
+    rows = []
+    while True:
+        count, = struct.unpack_from('>h', data, pos)
+        pos += 2
+        if count == -1:
+            break
+        row = {}
+        for k in fieldnames:
+            length, = struct.unpack_from('>i', data, pos)
+            pos += 4
+            if length == -1:
+                row[k] = None
+                continue
+            value = data[pos:pos + length]
+            pos += length
+            row[k] = decoders.get(pgcopy.COLUMN_TYPES.get(k), lambda b: b.decode('utf-8'))(value)
+        rows.append(row)
+    assert pos == len(data)
+    return rows
+
+
+class TestCopyFormats(unittest.TestCase):
+    data_url = 'tests/data/20160426_ct_rollups.json'
+
+    def setUp(self):
+        electiondate, races = utils.open_file(self.data_url)
+        self.payload = utils.load_results(electiondate, races)
+
+    def test_binary_round_trip(self):
+        out = io.BytesIO()
+        pgcopy.write_binary(iter(self.payload), out, batch_size=7)
+        rows = read_binary(out.getvalue())
+
+        self.assertEqual(len(rows), len(self.payload))
+        for row, p in zip(rows, self.payload):
+            for k in utils.KEY_ORDER:
+                if pgcopy.COLUMN_TYPES.get(k, 'text') == 'text' and p[k] is not None:
+                    self.assertEqual(row[k], pgcopy.text_bytes(p[k]).decode('utf-8'))
+                else:
+                    self.assertEqual(row[k], p[k])
+
+    def test_text_nulls(self):
+        text = pgcopy.format_text(self.payload)
+        lines = text.split('\n')
+        self.assertEqual(lines.pop(), '')
+        self.assertEqual(len(lines), len(self.payload))
+
+        for line, p in zip(lines, self.payload):
+            values = line.split('\t')
+            self.assertEqual(len(values), len(utils.KEY_ORDER))
+            for k, v in zip(utils.KEY_ORDER, values):
+                if p[k] is None:
+                    self.assertEqual(v, '\\N')
+                else:
+                    self.assertNotEqual(v, '\\N')
+
+    def test_text_escapes(self):
+        fieldnames = ('id', 'description', 'last', 'votecount', 'winner')
+        p = {'id': 'a', 'description': 'b\tc\nd\re\\N', 'last': None, 'votecount': 3, 'winner': True}
+        self.assertEqual(
+            pgcopy.format_text([p], fieldnames),
+            'a\tb\\tc\\nd\\re\\\\N\t\\N\t3\tTrue\n'
+        )
+
+    def test_upsert_sql(self):
+        sql = pgcopy.upsert_sql('results', binary=False)
+        self.assertIn('CREATE TABLE IF NOT EXISTS results (', sql)
+        self.assertIn('    votecount bigint', sql)
+        self.assertIn('FORMAT text', sql)
+        self.assertIn('PRIMARY KEY (raceid, level, reportingunitid, polnum)', sql)
+        self.assertIn('ON CONFLICT (raceid, level, reportingunitid, polnum) DO UPDATE SET', sql)
+        self.assertIn('    id = EXCLUDED.id', sql)
+        self.assertNotIn('polnum = EXCLUDED.polnum', sql)
+        self.assertNotIn('DISTINCT ON', sql)
@@ -0,0 +1,65 @@
+import unittest
+
+import projections
+import utils
+
+
+class TestProjections(unittest.TestCase):
+    """
+    Race, reporting unit and candidate records should cover the results
+    rows exactly once.
+    """
+    data_url = 'tests/data/20160426_ct_rollups.json'
+
+    def setUp(self):
+        electiondate, races = utils.open_file(self.data_url)
+        self.payload = utils.load_results(electiondate, races)
+
+    def records(self, iter_records):
+        electiondate, races = utils.open_file(self.data_url, stream=True)
+        return list(iter_records(electiondate, races))
+
+    def test_races(self):
+        records = self.records(projections.iter_races)
+        self.assertEqual(set(r['raceid'] for r in records), set(p['raceid'] for p in self.payload))
+        self.assertEqual(len(records), len(set(r['id'] for r in records)))
+
+        race = [r for r in records if r['raceid'] == '7002'][0]
+        self.assertEqual(race['id'], 'CT-7002')
+        self.assertEqual(race['statename'], 'Connecticut')
+        self.assertEqual(race['officename'], 'President')
+        self.assertEqual(set(race), set(projections.RACE_KEY_ORDER))
+
+    def test_reportingunits(self):
+        records = self.records(projections.iter_reportingunits)
+        self.assertEqual(len(records), len(set(r['id'] for r in records)))
+
+        totals = {}
+        for p in self.payload:
+            totals[(p['raceid'], p['reportingunitid'])] = p['totalvotes']
+        self.assertEqual(dict(((r['raceid'], r['reportingunitid']), r['votecount']) for r in records), totals)
+
+    def test_reportingunit_levels(self):
+        records = self.records(projections.iter_reportingunits)
+        levels = set(r['level'] for r in records if r['raceid'] == '7002')
+        self.assertEqual(levels, set(['state', 'township', 'county']))
+
+    def test_candidates(self):
+        records = self.records(projections.iter_candidates)
+        self.assertEqual(len(records), len(set(r['id'] for r in records)))
+
+        ids = set(r['id'] for r in records)
+        for p in self.payload:
+            if p['polid'] == '0':
+                self.assertIn('%s-polnum-%s' % (p['raceid'], p['polnum']), ids)
+            else:
+                self.assertIn(p['id'][:-len(p['reportingunitid']) - 1], ids)
+
+        trump = [r for r in records if r['id'] == '7002-polid-8639'][0]
+        self.assertEqual((trump['first'], trump['last'], trump['ballotorder']), ('Donald', 'Trump', 3))
+
+    def test_candidates_sharing_polid_0(self):
+        records = self.records(projections.iter_candidates)
+        polnums = set(p['polnum'] for p in self.payload if p['raceid'] == '22417')
+        self.assertEqual(len(polnums), 7)
+        self.assertEqual(set(r['polnum'] for r in records if r['raceid'] == '22417'), polnums)
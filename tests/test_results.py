@@ -95,3 +95,39 @@ class TestGeneralElectionEdgeCases(unittest.TestCase):
         state_results = [r['reportingunitid'] for r in self.candidate_reporting_units if r['level'] == 'state']
         unique_state_results = list(set(state_results))
         self.assertEqual(len(unique_state_results), 51)
+
+
+class TestIterResults(unittest.TestCase):
+    """
+    Streaming results should match the rows the fully loaded implementation
+    produced.
+    """
+    data_url = 'tests/data/20160301_super_tuesday.json'
+
+    def test_iter_results_is_lazy(self):
+        electiondate, races = utils.open_file(self.data_url)
+        results = utils.iter_results(electiondate, races)
+        self.assertFalse(isinstance(results, list))
+        self.assertEqual(next(results)['raceid'], '24547')
+
+    def test_iter_results_known_rows(self):
+        electiondate, races = utils.open_file(self.data_url, stream=True)
+        results = dict((r['id'], r) for r in utils.iter_results(electiondate, races))
+        self.assertEqual(len(results), 13357)
+        self.assertEqual(sum(r['votecount'] for r in results.values()), 5508966)
+
+        # Rows as the original, fully loaded implementation produced them.
+        expected = [
+            ('24547-polid-8639-MA-1', 'state', '', 'Trump', 311313, 631395, 0.4930558525170456),
+            ('24547-polid-45650-county-subunit-22265', 'county', 'BRISTOL', 'Gilmore', 1, 1446,
+             0.0006915629322268327),
+            ('24548-polid-22603-county-subunit-22133', 'county', 'NORFOLK', "O'Malley", 13, 1845,
+             0.007046070460704607),
+        ]
+        for row_id, level, reportingunitname, last, votecount, totalvotes, votepct in expected:
+            row = results[row_id]
+            self.assertEqual(
+                (row['level'], row['reportingunitname'], row['last'], row['votecount'], row['totalvotes']),
+                (level, reportingunitname, last, votecount, totalvotes)
+            )
+            self.assertAlmostEqual(row['votepct'], votepct)
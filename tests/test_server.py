@@ -0,0 +1,147 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+try:
+    from urllib.request import urlopen
+    from urllib.error import HTTPError
+except ImportError:
+    from urllib2 import urlopen, HTTPError
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+import server
+import utils
+
+
+class TestResultSet(unittest.TestCase):
+    data_url = 'tests/data/20160426_ct_rollups.json'
+
+    def setUp(self):
+        electiondate, races = utils.open_file(self.data_url)
+        self.payload = utils.load_results(electiondate, races)
+        self.results = server.ResultSet(self.payload)
+
+    def assertSelects(self, filters):
+        expected = [p for p in self.payload if all(p[k] in v for k, v in filters.items())]
+        self.assertEqual(self.results.select(filters), expected)
+
+    def test_no_filters(self):
+        self.assertEqual(self.results.select({}), self.payload)
+
+    def test_filters(self):
+        self.assertSelects({'raceid': ['7002']})
+        self.assertSelects({'raceid': ['7002', '7003'], 'level': ['state']})
+        self.assertSelects({'statepostal': ['CT'], 'level': ['county', 'state'], 'reportingunitid': ['CT-1']})
+
+    def test_no_matches(self):
+        self.assertEqual(self.results.select({'raceid': ['7002'], 'statepostal': ['NY']}), [])
+
+    def test_parse_query(self):
+        self.assertEqual(server.parse_query('raceid=7002,7003&level=state'),
+                         {'raceid': ['7002', '7003'], 'level': ['state']})
+        self.assertRaises(ValueError, server.parse_query, 'votecount=0')
+
+
+@unittest.skipIf(server.asyncio is None, 'results-server requires asyncio')
+class TestResultsServer(unittest.TestCase):
+    data_url = 'tests/data/20160426_ct_rollups.json'
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'results.json')
+        shutil.copy(self.data_url, self.path)
+
+        self.loop = server.asyncio.new_event_loop()
+        self.server = server.ResultsServer(self.path, self.loop, interval=60, log=StringIO())
+        self.port = self.server.start(port=0)
+        self.thread = threading.Thread(target=self.loop.run_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.server.stop()
+        self.loop.close()
+        shutil.rmtree(self.directory)
+
+    def get(self, path):
+        response = urlopen('http://127.0.0.1:%d%s' % (self.port, path))
+        try:
+            return response.read().decode('utf-8')
+        finally:
+            response.close()
+
+    def test_json(self):
+        rows = json.loads(self.get('/results?raceid=7002&level=state'))
+        self.assertEqual(len(rows), 5)
+        self.assertEqual(set(r['reportingunitid'] for r in rows), set(['CT-1']))
+
+    def test_csv(self):
+        lines = self.get('/results.csv?raceid=7002&level=state').splitlines()
+        self.assertEqual(lines[0], ','.join(utils.KEY_ORDER))
+        self.assertEqual(len(lines), 6)
+
+    def test_errors(self):
+        for path, status in (('/results?votecount=0', 400), ('/races', 404), ('/results.xml', 404)):
+            try:
+                self.get(path)
+            except HTTPError as e:
+                self.assertEqual(e.code, status)
+            else:
+                self.fail('%s did not fail' % path)
+
+    def test_reload(self):
+        status = json.loads(self.get('/status'))
+        self.assertEqual(status['rows'], 8343)
+
+        shutil.copy('tests/data/20160301_super_tuesday.json', self.path)
+        self.assertTrue(self.server.watcher.poll())
+
+        status = json.loads(self.get('/status'))
+        self.assertEqual(status['rows'], 13357)
+        self.assertEqual(json.loads(self.get('/results?raceid=7002')), [])
+
+
+class FakeTransport(object):
+
+    def __init__(self):
+        self.written = b''
+        self.closed = False
+
+    def write(self, data):
+        self.written += data
+
+    def close(self):
+        self.closed = True
+
+    def is_closing(self):
+        return self.closed
+
+
+@unittest.skipIf(server.asyncio is None, 'results-server requires asyncio')
+class TestHTTPProtocol(unittest.TestCase):
+
+    def setUp(self):
+        self.requests = []
+        self.protocol = server.HTTPProtocol(self)
+        self.protocol.connection_made(FakeTransport())
+
+    def respond(self, path, query, callback):
+        # Stands in for ResultsServer.respond, without answering, as a
+        # render still running in a worker thread would.
+        self.requests.append((path, query))
+
+    def test_dispatches_once(self):
+        self.protocol.data_received(b'GET /results?raceid=7002 HTTP/1.1\r\nHost: local')
+        self.assertEqual(self.requests, [])
+        self.protocol.data_received(b'host\r\n\r\n')
+        self.protocol.data_received(b'body')
+        self.protocol.data_received(b'\r\n\r\nmore')
+        self.assertEqual(self.requests, [('/results', 'raceid=7002')])
@@ -0,0 +1,83 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import unittest
+
+import sqlitestore
+import utils
+
+
+class TestSQLiteStore(unittest.TestCase):
+    data_url = 'tests/data/20160426_ct_rollups.json'
+
+    def setUp(self):
+        electiondate, races = utils.open_file(self.data_url)
+        self.payload = utils.load_results(electiondate, races)
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'results.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def query(self, sql, *params):
+        connection = sqlite3.connect(self.path)
+        try:
+            return connection.execute(sql, params).fetchall()
+        finally:
+            connection.close()
+
+    def test_rows(self):
+        count = sqlitestore.write_sqlite(iter(self.payload), self.path, batch_size=1000)
+        self.assertEqual(count, len(self.payload))
+
+        # AP reuses polid '0', so candidates sharing an id are kept apart.
+        self.assertEqual(self.query('SELECT COUNT(*) FROM results'), [(len(self.payload),)])
+        shared = [p for p in self.payload if p['id'] == '22417-polid-0-MD-1']
+        self.assertEqual(len(shared), 7)
+        self.assertEqual(
+            self.query('SELECT COUNT(DISTINCT polnum) FROM results WHERE id = ?', '22417-polid-0-MD-1'),
+            [(7,)]
+        )
+
+        p = [p for p in self.payload if p['id'] == '7002-polid-8639-CT-1'][0]
+        row = self.query('SELECT votecount, votepct, winner, test, statename FROM results WHERE id = ?', p['id'])
+        self.assertEqual(row, [(p['votecount'], p['votepct'], None, 1, 'Connecticut')])
+
+        winners = [r for r in self.payload if r['winner'] is True]
+        self.assertEqual(self.query('SELECT COUNT(*) FROM results WHERE winner = 1'), [(len(winners),)])
+
+    def test_indexes(self):
+        sqlitestore.write_sqlite(iter(self.payload), self.path)
+        indexes = set(name for name, in self.query("SELECT name FROM sqlite_master WHERE type = 'index'"))
+        for k in sqlitestore.INDEX_KEYS:
+            self.assertIn('results_%s' % k, indexes)
+
+    def test_upsert(self):
+        sqlitestore.write_sqlite(iter(self.payload), self.path)
+
+        p = dict(self.payload[0], votecount=self.payload[0]['votecount'] + 1)
+        sqlitestore.write_sqlite(iter([p]), self.path)
+
+        self.assertEqual(self.query('SELECT COUNT(*) FROM results'), [(len(self.payload),)])
+        key = ' AND '.join('%s = ?' % k for k in utils.ROW_KEYS)
+        self.assertEqual(
+            self.query('SELECT votecount FROM results WHERE ' + key, *[p[k] for k in utils.ROW_KEYS]),
+            [(p['votecount'],)]
+        )
+
+    def test_repeated_key_fails(self):
+        sqlitestore.write_sqlite(iter(self.payload), self.path)
+        p = dict(self.payload[0], votecount=-1)
+        self.assertRaises(sqlite3.IntegrityError, sqlitestore.write_sqlite, iter([p, p]), self.path)
+        self.assertEqual(self.query('SELECT COUNT(*) FROM results WHERE votecount = -1'), [(0,)])
+
+    def test_failed_load_rolls_back(self):
+        sqlitestore.write_sqlite(iter(self.payload), self.path)
+
+        def payload():
+            yield dict(self.payload[0], votecount=-1)
+            raise ValueError
+
+        self.assertRaises(ValueError, sqlitestore.write_sqlite, payload(), self.path)
+        self.assertEqual(self.query('SELECT COUNT(*) FROM results WHERE votecount = -1'), [(0,)])
@@ -0,0 +1,112 @@
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+try:
+    from StringIO import StringIO
+except ImportError:
+    from io import StringIO
+
+import cache
+import watch
+
+
+class TestWriteAtomic(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'results.csv')
+        with open(self.path, 'w') as writefile:
+            writefile.write('old')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def read(self):
+        with open(self.path, 'r') as readfile:
+            return readfile.read()
+
+    def test_replaces_file(self):
+        watch.write_atomic(self.path, lambda: sys.stdout.write('new\r\n'))
+        with open(self.path, 'rb') as readfile:
+            self.assertEqual(readfile.read(), b'new\r\n')
+        self.assertEqual(os.listdir(self.directory), ['results.csv'])
+
+    def test_failure_keeps_file(self):
+        def render():
+            sys.stdout.write('partial')
+            raise ValueError('Unexpected end of AP JSON data')
+
+        self.assertRaises(ValueError, watch.write_atomic, self.path, render)
+        self.assertEqual(self.read(), 'old')
+        self.assertEqual(os.listdir(self.directory), ['results.csv'])
+
+
+class TestWatcher(unittest.TestCase):
+    data_url = 'tests/data/20160426_ct_rollups.json'
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.path = os.path.join(self.directory, 'results.json')
+        shutil.copy(self.data_url, self.path)
+
+        self.processed = 0
+        self.watcher = watch.Watcher(self.path, self.process, cache.snapshot_key, log=StringIO())
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def process(self):
+        with open(self.path, 'rb') as readfile:
+            if not readfile.read().endswith(b'}'):
+                raise ValueError('Unexpected end of AP JSON data')
+        self.processed += 1
+
+    def touch(self, data=None):
+        if data is not None:
+            with open(self.path, 'wb') as writefile:
+                writefile.write(data)
+        st = os.stat(self.path)
+        os.utime(self.path, (st.st_atime, st.st_mtime + 1))
+
+    def test_processes_once(self):
+        self.assertTrue(self.watcher.poll())
+        self.assertFalse(self.watcher.poll())
+        self.assertEqual(self.processed, 1)
+
+    def test_skips_unchanged_contents(self):
+        self.watcher.poll()
+        self.touch()
+        self.assertFalse(self.watcher.poll())
+        self.assertEqual(self.processed, 1)
+
+    def test_survives_errors(self):
+        errors = [IOError(2, 'No such file or directory'), KeyError('races')]
+
+        def process():
+            if errors:
+                raise errors.pop(0)
+            self.process()
+
+        self.watcher.process = process
+        self.assertFalse(self.watcher.poll())
+        self.touch(b'{"electionDate": "2016-04-26", "races": []}')
+        self.assertFalse(self.watcher.poll())
+        self.touch(b'{"electionDate": "2016-04-26", "races": [] }')
+        self.assertTrue(self.watcher.poll())
+        self.assertEqual(self.processed, 1)
+        self.assertIn('KeyError', self.watcher.log.getvalue())
+
+    def test_processes_changed_contents(self):
+        self.watcher.poll()
+        with open(self.data_url, 'rb') as readfile:
+            data = readfile.read()
+
+        # A partly written file is skipped, then processed once complete.
+        self.touch(data[:1000])
+        self.assertFalse(self.watcher.poll())
+        self.touch(data.replace(b'"Trump"', b'"Trump "'))
+        self.assertTrue(self.watcher.poll())
+        self.assertEqual(self.processed, 2)